@@ -1,3 +1,6 @@
-import mbench.demographic
-import mbench.intervention
-import mbench.util
+from ._lazy import lazy_exports
+
+__getattr__, __dir__ = lazy_exports(__name__, {
+    name: ("." + name, None)
+    for name in ("benchmark", "demographic", "eir", "export", "intervention", "model", "spatial", "sweep", "util")
+})
@@ -0,0 +1,31 @@
+# lazy package attributes, submodules and their heavy dependencies (pandas, scipy, lxml) are imported on first
+# access instead of when the package is imported, so process pool workers and command line tools only pay for what
+# they use
+
+import importlib
+
+
+def lazy_exports(package: str, exports: dict):
+    """
+    module __getattr__ and __dir__ resolving exported names on first access
+    e.g. __getattr__, __dir__ = lazy_exports(__name__, {"adm1_name": (".reformat", "adm1_name")})
+    :param package: __name__ of the package
+    :param exports: name to (relative module, attribute), attribute None for the module itself
+    :return: __getattr__, __dir__
+    """
+    namespace = importlib.import_module(package).__dict__
+
+    def __getattr__(name):
+        if name not in exports:
+            raise AttributeError("module {!r} has no attribute {!r}".format(package, name))
+        module, attribute = exports[name]
+        value = importlib.import_module(module, package)
+        if attribute is not None:
+            value = getattr(value, attribute)
+        namespace[name] = value
+        return value
+
+    def __dir__():
+        return sorted(set(namespace) | set(exports))
+
+    return __getattr__, __dir__
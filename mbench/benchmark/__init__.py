@@ -0,0 +1,8 @@
+from mbench._lazy import lazy_exports
+
+__getattr__, __dir__ = lazy_exports(__name__, {
+    "datasets": (".datasets", None),
+    "CASES": (".suite", "CASES"),
+    "run": (".suite", "run"),
+    "compare": (".suite", "compare"),
+})
@@ -0,0 +1,35 @@
+# python -m mbench.benchmark --out results.json --baseline previous.json
+
+import argparse
+import json
+import sys
+
+from .datasets import SCALES
+from .suite import CASES, compare, run
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m mbench.benchmark", description="time mbench on synthetic data")
+    parser.add_argument("--scale", action="append", choices=list(SCALES), help="scales to run, default to all")
+    parser.add_argument("--case", action="append", choices=list(CASES), help="cases to run, default to all")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--out", help="JSON file for the results")
+    parser.add_argument("--baseline", help="JSON results of a previous run, exit with 1 on regressions")
+    parser.add_argument("--threshold", type=float, default=1.25, help="allowed slowdown against the baseline")
+    args = parser.parse_args(argv)
+
+    scales = {scale: SCALES[scale] for scale in (args.scale or SCALES)}
+    report = run(scales, args.case, args.repeat, args.out)
+    for result in report["results"]:
+        print("{case:40s} {scale:6s} {n:>6d} {min:12.6f}s {per_item:12.3e}s/item".format(**result))
+    if args.baseline is None:
+        return 0
+    with open(args.baseline) as f:
+        slower = compare(json.load(f), report, args.threshold)
+    for name, scale, before, after, ratio in slower:
+        print("slower: {} {} {:.6f}s -> {:.6f}s ({:.2f}x)".format(name, scale, before, after, ratio))
+    return 1 if slower else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,97 @@
+# fixed synthetic inputs for the benchmarks, generated from a seed so that every run and every machine times the
+# same data, no network or data directory needed
+
+import numpy as np
+import pandas as pd
+
+# number of districts at each administrative scale, adm1 and adm2 follow Ghana (16 regions, 260 districts)
+SCALES = {
+    "adm1": 16,
+    "adm2": 260,
+    "pixel": 20000,
+}
+
+_SCENARIO = """<?xml version="1.0" encoding="UTF-8"?>
+<om:scenario xmlns:om="http://openmalaria.org/schema/scenario_44" name="benchmark" schemaVersion="44">
+  <demography maximumAgeYrs="90" name="benchmark" popSize="10000"/>
+  <monitoring name="survey"><surveys>{surveys}</surveys></monitoring>
+  <interventions name="itn"><human><deployment><timed>{deployments}</timed></deployment></human></interventions>
+  <healthSystem><ImmediateOutcomes name="benchmark"/></healthSystem>
+  <entomology mode="dynamic" name="gambiae" scaledAnnualEIR="10"><vector/></entomology>
+  <model><parameters interval="5"/></model>
+</om:scenario>
+"""
+
+
+def district_names(n: int) -> list:
+    """
+    raw district names in the spellings found in the source spreadsheets, mixed case, spaces and dashes
+    """
+    spellings = ("Region {}", "region-{}", "REGION {}", "Region_{}")
+    return [spellings[i % len(spellings)].format(i) for i in range(n)]
+
+
+def district_table(n: int, seed: int = 0, missing: float = 0.2) -> pd.DataFrame:
+    """
+    district parameter table like gha, indexed by normalized names
+    :param n: number of districts
+    :param seed: random seed
+    :param missing: proportion of eir and treatment_seeking values set to nan, for missing_data
+    :return: DataFrame with raw_name, eir, itn_cov, resistance and treatment_seeking columns
+    """
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        "raw_name": district_names(n),
+        "eir": 10 ** rng.uniform(-1, 2.5, n),
+        "itn_cov": rng.uniform(0, 1, n),
+        "resistance": rng.uniform(0, 1, n),
+        "treatment_seeking": rng.uniform(0.2, 0.8, n),
+    }, index=pd.Index(["REGION_{}".format(i) for i in range(n)], name="adm1"))
+    for column in ("eir", "treatment_seeking"):
+        df.loc[rng.random(n) < missing, column] = np.nan
+    return df
+
+
+def neighbour_table(n: int) -> pd.DataFrame:
+    """
+    districts laid out on a square grid, each bordering its 4 neighbours, both directions listed
+    :return: DataFrame with from and to columns of district names
+    """
+    width = int(np.ceil(np.sqrt(n)))
+    cells = np.arange(n)
+    pairs = [
+        (cells[(cells % width) < width - 1], cells[(cells % width) < width - 1] + 1),
+        (cells, cells + width),
+    ]
+    origin = np.concatenate([a for a, b in pairs])
+    destination = np.concatenate([b for a, b in pairs])
+    keep = destination < n
+    origin, destination = origin[keep], destination[keep]
+    names = np.array(["REGION_{}".format(i) for i in range(n)], dtype=object)
+    return pd.DataFrame({
+        "from": np.concatenate([names[origin], names[destination]]),
+        "to": np.concatenate([names[destination], names[origin]]),
+    })
+
+
+def resistance_grid(n: int = 11) -> np.ndarray:
+    """
+    evenly spaced vector resistance levels, 1 - bioassay mortality
+    """
+    return np.linspace(0, 1, n)
+
+
+def scenario_template(path: str, n_deployments: int = 8, n_surveys: int = 73) -> str:
+    """
+    write an OpenMalaria scenario used as template by the exporters and load_xml_config
+    :param path: output path
+    :param n_deployments: timed ITN deployments, scales the size of the interventions section
+    :param n_surveys: survey times
+    :return: path
+    """
+    deployments = "".join(
+        '<deploy coverage="0.5" time="{}"/>'.format(1 + 73 * i) for i in range(n_deployments))
+    surveys = "".join("<surveyTime>{}</surveyTime>".format(1 + 5 * i) for i in range(n_surveys))
+    with open(path, "w") as f:
+        f.write(_SCENARIO.format(deployments=deployments, surveys=surveys))
+    return path
@@ -0,0 +1,202 @@
+import json
+import os
+import platform
+import statistics
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from mbench.demographic import adm1_name
+from mbench.export import imperial, malariaone
+from mbench.intervention.efficacy import Converter, Converter_2022
+from mbench.util import instrument, missing_data_interpolate
+from mbench.util import xml_import
+from . import datasets
+
+# benchmark cases, name -> (setup, largest n it runs at)
+# setup(n, directory) prepares the inputs outside the timed region and returns the function to time
+CASES = {}
+
+
+def case(name: str, max_n: int = None):
+    def register(setup):
+        CASES[name] = (setup, max_n)
+        return setup
+    return register
+
+
+@case("converter.bioassay_to_rds", max_n=5000)
+def _bioassay_to_rds(n, directory):
+    converter = Converter()
+    mortality = 1 - datasets.district_table(n)["resistance"].to_numpy()
+    return lambda: [converter.bioassay_to_rds(x) for x in mortality]
+
+
+@case("converter.bioassay_to_rds_array")
+def _bioassay_to_rds_array(n, directory):
+    converter = Converter()
+    mortality = 1 - datasets.district_table(n)["resistance"].to_numpy()
+    return lambda: converter.bioassay_to_rds_array(mortality)
+
+
+@case("converter.evaluate.d_r_itn")
+def _evaluate(n, directory):
+    converter = Converter()
+    mortality = 1 - datasets.district_table(n)["resistance"].to_numpy()
+    return lambda: converter.evaluate(mortality, ("d_itn", "r_itn"))
+
+
+@case("converter.evaluate.d_r_itn.scalar", max_n=5000)
+def _evaluate_scalar(n, directory):
+    converter = Converter()
+    mortality = 1 - datasets.district_table(n)["resistance"].to_numpy()
+    return lambda: [converter.evaluate(x, ("d_itn", "r_itn")) for x in mortality]
+
+
+@case("converter_2022.bioassay_to_rds_array")
+def _bioassay_to_rds_array_2022(n, directory):
+    converter = Converter_2022()
+    mortality = 1 - datasets.district_table(n)["resistance"].to_numpy()
+    return lambda: converter.bioassay_to_rds_array(mortality)
+
+
+@case("missing_data")
+def _missing_data(n, directory):
+    df = datasets.district_table(n)
+    neighbour = datasets.neighbour_table(n)
+    return lambda: missing_data_interpolate(df, neighbour, ["eir", "treatment_seeking"], round_n=100)
+
+
+@case("adm1_name")
+def _adm1_name(n, directory):
+    df = datasets.district_table(n).reset_index(drop=True)
+    return lambda: adm1_name(df, original_column_name="raw_name")
+
+
+@case("load_xml_config")
+def _load_xml_config(n, directory):
+    path = datasets.scenario_template(os.path.join(directory, "load_{}.xml".format(n)), n_deployments=n)
+    return lambda: xml_import.load_xml_config(path, cache=False)
+
+
+@case("load_xml_config.cached")
+def _load_xml_config_cached(n, directory):
+    path = datasets.scenario_template(os.path.join(directory, "cached_{}.xml".format(n)), n_deployments=n)
+    return lambda: xml_import.load_xml_config(path)
+
+
+@case("export.malariaone", max_n=260)
+def _export_malariaone(n, directory):
+    template = datasets.scenario_template(os.path.join(directory, "template.xml"))
+    df = datasets.district_table(n)
+    out_dir = os.path.join(directory, "malariaone_{}".format(n))
+    return lambda: malariaone.export(df, template, out_dir)
+
+
+@case("export.imperial.parameter_table")
+def _parameter_table(n, directory):
+    df = datasets.district_table(n)[["eir", "itn_cov", "treatment_seeking"]]
+    resistance = datasets.resistance_grid()
+    return lambda: imperial.parameter_table(df, resistance)
+
+
+@case("export.imperial.csv", max_n=260)
+def _export_imperial(n, directory):
+    df = datasets.district_table(n)[["eir", "itn_cov", "treatment_seeking"]]
+    resistance = datasets.resistance_grid()
+    path = os.path.join(directory, "imperial_{}.csv".format(n))
+    return lambda: imperial.export(imperial.parameter_table(df, resistance), path)
+
+
+@instrument.instrument
+def _noop(x):
+    return x
+
+
+@case("instrument.disabled", max_n=260)
+def _instrument_disabled(n, directory):
+    # n * 1000 calls of an instrumented function, against instrument.enabled gives the cost per call
+    return lambda: [_noop(i) for i in range(n * 1000)]
+
+
+@case("instrument.enabled", max_n=260)
+def _instrument_enabled(n, directory):
+    def fn():
+        instrument.enable()
+        try:
+            return [_noop(i) for i in range(n * 1000)]
+        finally:
+            instrument.disable()
+            instrument.reset()
+    return fn
+
+
+def _time(fn, repeat: int) -> list:
+    fn()  # warm up, e.g. imports and first touch of the inputs
+    seconds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        seconds.append(time.perf_counter() - start)
+    return seconds
+
+
+def run(scales=None, cases=None, repeat: int = 5, path: str = None) -> dict:
+    """
+    time every case at every scale
+    :param scales: dict of scale name to number of districts, default to datasets.SCALES
+    :param cases: names of the cases to run, default to all of CASES
+    :param repeat: timed calls per case and scale, after one warm up call
+    :param path: write the results to this JSON file
+    :return: dict with the environment and one result per case and scale, times in seconds
+    """
+    scales = datasets.SCALES if scales is None else scales
+    cases = list(CASES) if cases is None else list(cases)
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for name in cases:
+            setup, max_n = CASES[name]
+            for scale, n in scales.items():
+                if max_n is not None and n > max_n:
+                    continue
+                seconds = _time(setup(n, directory), repeat)
+                results.append({
+                    "case": name,
+                    "scale": scale,
+                    "n": n,
+                    "min": min(seconds),
+                    "median": statistics.median(seconds),
+                    "per_item": min(seconds) / n,
+                })
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "repeat": repeat,
+        "results": results,
+    }
+    if path is not None:
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2)
+    return report
+
+
+def compare(baseline: dict, current: dict, threshold: float = 1.25) -> list:
+    """
+    cases that got slower than threshold times the baseline, compared on the fastest of the repeats
+    :param baseline: report of run, or loaded from its JSON file
+    :param current: report of run
+    :param threshold: allowed slowdown ratio
+    :return: list of (case, scale, baseline seconds, current seconds, ratio)
+    """
+    before = {(r["case"], r["scale"]): r["min"] for r in baseline["results"]}
+    slower = []
+    for result in current["results"]:
+        key = (result["case"], result["scale"])
+        if key in before and result["min"] > threshold * before[key]:
+            slower.append(key + (before[key], result["min"], result["min"] / before[key]))
+    return slower
@@ -1 +1,10 @@
-from .reformat import adm1_name
+from mbench._lazy import lazy_exports
+
+__getattr__, __dir__ = lazy_exports(__name__, {
+    "adm1_name": (".reformat", "adm1_name"),
+    "normalize_name": (".reformat", "normalize_name"),
+    "normalize_names": (".reformat", "normalize_names"),
+    "DistrictIndex": (".district_index", "DistrictIndex"),
+    "NameMatcher": (".matching", "NameMatcher"),
+    "Aggregator": (".aggregate", "Aggregator"),
+})
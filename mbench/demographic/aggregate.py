@@ -0,0 +1,114 @@
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from mbench.util.instrument import instrument
+
+
+class Aggregator:
+    """
+    mapping between two administrative levels compiled once into a sparse (target x source) weight matrix, any
+    number of indicator columns (e.g. one per year) are then moved between the levels with one sparse product
+    e.g. adm2 coverage rolled up to adm1 weighted by population, 216 district values remapped onto the 260 districts
+    or pixels aggregated to adm2
+    """
+
+    def __init__(
+            self,
+            mapping: pd.DataFrame,
+            source: str = "adm2",
+            target: str = "adm1",
+            weight: str = None,
+            source_index=None,
+            target_index=None,
+    ):
+        """
+        :param mapping: one row per (source unit, target unit) pair, a source split between targets has several rows
+        :param source: column of the source units, e.g. adm2 or pixel ids
+        :param target: column of the target units, e.g. adm1
+        :param weight: column of the weight of each pair, e.g. population or overlapping area, None for equal weights
+        :param source_index: order of the source units, default to their order of appearance in mapping
+        :param target_index: order of the target units, default to their order of appearance in mapping
+        """
+        self.source_index = pd.Index(pd.unique(mapping[source]) if source_index is None else source_index)
+        self.target_index = pd.Index(pd.unique(mapping[target]) if target_index is None else target_index)
+        rows = self.target_index.get_indexer(mapping[target])
+        columns = self.source_index.get_indexer(mapping[source])
+        weights = np.ones(len(mapping)) if weight is None else mapping[weight].to_numpy(dtype=float)
+        keep = (rows >= 0) & (columns >= 0) & np.isfinite(weights) & (weights > 0)
+        self.weights = sparse.csr_matrix(
+            (weights[keep], (rows[keep], columns[keep])),
+            shape=(len(self.target_index), len(self.source_index)),
+        )
+        self.weights.sum_duplicates()
+        self._matrices = {}
+
+    def _matrix(self, kind: str):
+        """
+        weights normalized for each direction, built on first use
+        shares of a source going to each target (sum), of a target coming from each source (split), and the
+        transposed weights for disaggregated means (copy)
+        """
+        if kind not in self._matrices:
+            if kind in ("mean", "sum"):
+                matrix = self.weights
+            elif kind in ("copy", "split"):
+                matrix = self.weights.T.tocsr()
+            else:
+                raise ValueError("unknown method {}".format(kind))
+            if kind in ("sum", "split"):
+                # each column sums to 1, so that totals are conserved
+                totals = np.asarray(matrix.sum(axis=0)).ravel()
+                matrix = matrix @ sparse.diags(np.divide(1, totals, out=np.zeros_like(totals), where=totals > 0))
+            self._matrices[kind] = matrix.tocsr()
+        return self._matrices[kind]
+
+    def _apply(self, values, kind: str, index_in: pd.Index, index_out: pd.Index):
+        frame = isinstance(values, (pd.DataFrame, pd.Series))
+        if frame:
+            values = values.reindex(index_in)
+            array = values.to_numpy(dtype=float)
+        else:
+            array = np.asarray(values, dtype=float)
+        matrix = self._matrix(kind)
+        array_2d = array.reshape(len(index_in), -1)
+        known = ~np.isnan(array_2d)
+        total = matrix @ np.where(known, array_2d, 0.)
+        if kind in ("mean", "copy"):
+            # weighted mean over the known values only
+            with np.errstate(invalid="ignore", divide="ignore"):
+                result = total / (matrix @ known.astype(float))
+        else:
+            result = np.where((matrix != 0).astype(float) @ known.astype(float) > 0, total, np.nan)
+        result = result.reshape((len(index_out),) + array.shape[1:])
+        if not frame:
+            return result
+        if isinstance(values, pd.Series):
+            return pd.Series(result, index=index_out, name=values.name)
+        return pd.DataFrame(result, index=index_out, columns=values.columns)
+
+    @instrument(items=1)
+    def aggregate(self, values, how: str = "mean"):
+        """
+        source to target level
+        :param values: DataFrame or Series indexed by source unit, or array of shape (n source, ...), nan are ignored
+        :param how: "mean" weighted by the mapping weights, for rates and coverages, or "sum" for counts, a source
+        split between targets is shared in proportion to the weights
+        :return: same kind as values, indexed by target unit
+        """
+        if how not in ("mean", "sum"):
+            raise ValueError("how should be mean or sum, got {}".format(how))
+        return self._apply(values, how, self.source_index, self.target_index)
+
+    @instrument(items=1)
+    def disaggregate(self, values, how: str = "copy"):
+        """
+        target to source level
+        :param values: DataFrame or Series indexed by target unit, or array of shape (n target, ...)
+        :param how: "copy" gives each source the (weighted mean) value of its targets, for rates and coverages,
+        "split" shares the target counts between its sources in proportion to the weights
+        :return: same kind as values, indexed by source unit
+        """
+        if how not in ("copy", "split"):
+            raise ValueError("how should be copy or split, got {}".format(how))
+        return self._apply(values, how, self.target_index, self.source_index)
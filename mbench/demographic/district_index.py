@@ -0,0 +1,97 @@
+import numpy as np
+import pandas as pd
+
+from .reformat import normalize_names
+
+
+class DistrictIndex:
+    """
+    canonical district name index, a hash map from reformatted name to an integer district code
+    encode district columns once, then merge and group on the integer codes instead of strings
+    """
+
+    def __init__(self, names, previous_names=None):
+        """
+        :param names: canonical district names, code i is names[i] after reformatting
+        :param previous_names: optional name of each district in a previous district system, e.g. the 216 district
+        name of each of the 260 districts, of the same length as names
+        """
+        self.names = pd.Index(normalize_names(names))
+        if self.names.has_duplicates:
+            raise ValueError("duplicated district names: {}".format(list(self.names[self.names.duplicated()])))
+        # lookup keys and their codes, aliases are appended to the canonical names
+        self._keys = self.names
+        self._codes = np.arange(len(self.names))
+
+        self.previous = None
+        self.previous_codes = None
+        if previous_names is not None:
+            previous_names = normalize_names(previous_names)
+            if len(previous_names) != len(self.names):
+                raise ValueError("previous_names should have one name per district")
+            self.previous = DistrictIndex(pd.unique(previous_names[~pd.isna(previous_names)]))
+            self.previous_codes = self.previous.encode(previous_names)
+
+    @classmethod
+    def from_table(cls, table: pd.DataFrame, column: str = "260", previous_column: str = "216"):
+        """
+        build the index from a district table, e.g. the "216 to 260.csv" mapping
+        :param table: pandas DataFrame with one row per district
+        :param column: column of the canonical names
+        :param previous_column: column of the previous system names, None to ignore
+        :return: DistrictIndex
+        """
+        previous_names = None if previous_column is None else table[previous_column]
+        return cls(table[column], previous_names)
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return self.encode([name])[0] >= 0
+
+    def add_aliases(self, aliases, names):
+        """
+        register alternative spellings, e.g. "Northern East" for "NORTH_EAST"
+        :param aliases: alternative names
+        :param names: canonical name of each alias
+        :return: self
+        """
+        codes = self.encode(names)
+        if (codes < 0).any():
+            raise KeyError("unknown district names: {}".format(list(np.asarray(names, dtype=object)[codes < 0])))
+        aliases = pd.Index(normalize_names(aliases))
+        new = ~aliases.isin(self._keys)
+        self._keys = self._keys.append(aliases[new])
+        self._codes = np.concatenate([self._codes, codes[new]])
+        return self
+
+    def encode(self, values) -> np.ndarray:
+        """
+        district codes of raw names, names are reformatted before the lookup
+        :param values: array like of district names
+        :return: integer numpy array, -1 for unknown names
+        """
+        position = self._keys.get_indexer(normalize_names(values))
+        return np.where(position >= 0, self._codes[position], -1)
+
+    def decode(self, codes) -> np.ndarray:
+        """
+        canonical names of district codes
+        :param codes: array like of district codes
+        :return: numpy object array, nan for -1
+        """
+        codes = np.asarray(codes)
+        names = np.append(self.names.to_numpy(dtype=object), np.nan)
+        return names[np.where(codes >= 0, codes, -1)]
+
+    def to_previous(self, codes) -> np.ndarray:
+        """
+        codes of the previous district system, see previous_names
+        :param codes: array like of district codes
+        :return: integer numpy array of codes in self.previous, -1 for unknown
+        """
+        if self.previous_codes is None:
+            raise ValueError("the index has no previous district system")
+        codes = np.asarray(codes)
+        return np.where(codes >= 0, self.previous_codes[codes], -1)
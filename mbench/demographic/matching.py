@@ -0,0 +1,127 @@
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from mbench.util.instrument import instrument
+from .district_index import DistrictIndex
+from .reformat import normalize_names
+
+
+def trigrams(name: str) -> set:
+    """
+    character trigrams of a reformatted district name, padded so that the first and last letters count twice
+    :param name: reformatted name, see normalize_name
+    :return: set of trigrams
+    """
+    padded = "  " + name.replace("_", " ") + " "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class NameMatcher:
+    """
+    fuzzy district name matcher, raw names are reformatted then compared to the canonical names by the Dice
+    similarity of their trigram sets
+    candidates are indexed once as a sparse (candidate x trigram) matrix, a whole column of raw names is scored with
+    one sparse product, so only candidates sharing at least one trigram with a name are ever compared
+    """
+
+    def __init__(self, candidates, threshold: float = 0.7, margin: float = 0.1):
+        """
+        :param candidates: canonical district names, or a DistrictIndex
+        :param threshold: matches scoring below the threshold are flagged for review
+        :param margin: matches less than margin above the runner up are flagged for review
+        """
+        self.index = candidates if isinstance(candidates, DistrictIndex) else None
+        names = candidates.names if self.index is not None else pd.unique(normalize_names(candidates))
+        self.names = np.asarray(names, dtype=object)
+        self.threshold = threshold
+        self.margin = margin
+        self.vocabulary = {}
+        self._matrix, self._sizes = self._encode(self.names, grow=True)
+
+    def _encode(self, names, grow: bool = False):
+        """
+        sparse binary (name x trigram) matrix and the number of trigrams of each name
+        """
+        rows, cols, sizes = [], [], []
+        for row, name in enumerate(names):
+            grams = trigrams(name)
+            sizes.append(len(grams))
+            for gram in grams:
+                col = self.vocabulary.get(gram)
+                if col is None and grow:
+                    col = self.vocabulary[gram] = len(self.vocabulary)
+                if col is not None:
+                    rows.append(row)
+                    cols.append(col)
+        matrix = sparse.csr_matrix(
+            (np.ones(len(rows)), (rows, cols)),
+            shape=(len(names), len(self.vocabulary))
+        )
+        return matrix, np.asarray(sizes, dtype=float)
+
+    @instrument(items=1)
+    def match(self, values, threshold: float = None) -> pd.DataFrame:
+        """
+        match a column of raw names to the canonical names
+        :param values: array like of raw district names, e.g. a pandas Series
+        :param threshold: review threshold, default to the matcher threshold
+        :return: pandas DataFrame with one row per value, with the reformatted name, the best match, its score in
+        [0, 1], whether it is exact, the runner up and its score, whether it needs review, and the district code when
+        built from a DistrictIndex
+        """
+        threshold = self.threshold if threshold is None else threshold
+        index = values.index if isinstance(values, pd.Series) else None
+        normalized = normalize_names(values)
+
+        # score every distinct name once
+        codes, uniques = pd.factorize(normalized)
+        uniques = np.asarray(uniques, dtype=object)
+        query, sizes = self._encode(uniques)
+        shared = (query @ self._matrix.T).tocoo()
+        dice = 2 * shared.data / (sizes[shared.row] + self._sizes[shared.col])
+        scores = sparse.csr_matrix((dice, (shared.row, shared.col)), shape=shared.shape)
+        best = np.asarray(scores.argmax(axis=1)).ravel()
+        best_score = np.asarray(scores.max(axis=1).todense()).ravel()
+        matches = np.where(best_score > 0, self.names[best], np.nan)
+
+        # runner up, for the review of ambiguous matches
+        rows = np.repeat(np.arange(len(uniques)), np.diff(scores.indptr))
+        scores.data[scores.indices == best[rows]] = 0
+        scores.eliminate_zeros()
+        second = np.asarray(scores.argmax(axis=1)).ravel()
+        second_score = np.asarray(scores.max(axis=1).todense()).ravel()
+        alternatives = np.where(second_score > 0, self.names[second], np.nan)
+
+        # exact matches win regardless of trigram ties
+        exact = pd.Index(self.names).get_indexer(uniques)
+        matches = np.where(exact >= 0, uniques, matches)
+        best_score = np.where(exact >= 0, 1., best_score)
+
+        result = pd.DataFrame({
+            "raw": np.asarray(values, dtype=object),
+            "name": normalized,
+            "match": np.append(matches, np.nan)[codes],
+            "score": np.append(best_score, np.nan)[codes],
+            "exact": np.append(exact >= 0, False)[codes],
+            "alternative": np.append(alternatives, np.nan)[codes],
+            "alternative_score": np.append(second_score, np.nan)[codes],
+        }, index=index)
+        result["review"] = ~result["exact"] & ~(
+                (result["score"] >= threshold) & (result["score"] - result["alternative_score"] >= self.margin))
+        if self.index is not None:
+            result["code"] = self.index.encode(result["match"])
+        return result
+
+    @staticmethod
+    def report(result: pd.DataFrame) -> pd.DataFrame:
+        """
+        review report of a match result, one row per distinct raw name which is not an exact match
+        :param result: output of match
+        :return: pandas DataFrame sorted by increasing score, with the number of rows of each raw name
+        """
+        inexact = result[~result["exact"]]
+        report = inexact.groupby(
+            ["raw", "match", "score", "alternative", "alternative_score", "review"], dropna=False
+        ).size()
+        return report.rename("rows").reset_index().sort_values("score", na_position="first")
@@ -1,6 +1,39 @@
+import numpy as np
 import pandas as pd
 
+from mbench.util.instrument import instrument
 
+# upper case first, then space and - to underscore
+_NAME_TRANSLATION = str.maketrans({" ": "_", "-": "_"})
+
+
+def normalize_name(name):
+    """
+    reformat a single district name, upper case, space and - to underscore
+    :param name: district name, values which are not strings are returned unchanged
+    :return: reformatted name
+    """
+    if isinstance(name, str):
+        return name.upper().translate(_NAME_TRANSLATION)
+    return name
+
+
+@instrument
+def normalize_names(values) -> np.ndarray:
+    """
+    vectorized normalize_name, every distinct name is reformatted only once
+    :param values: array like of district names, e.g. a pandas Series or Index
+    :return: numpy object array of reformatted names, nan stays nan
+    """
+    if not isinstance(values, (pd.Series, pd.Index, np.ndarray)):
+        values = np.asarray(values, dtype=object)
+    codes, uniques = pd.factorize(values)
+    normalized = np.array([normalize_name(name) for name in uniques] + [np.nan], dtype=object)
+    # code -1 (missing) picks the trailing nan
+    return normalized[codes]
+
+
+@instrument
 def adm1_name(
         df,
         original_column_name: str = "adm1",
@@ -25,13 +58,8 @@ def adm1_name(
     # 1. Rename the column name to new_column_name
     if type(df) is pd.DataFrame:
         df = df.rename(columns={original_column_name: new_column_name})
-        # 2. reformat district name
-        ## to upper case
-        df[new_column_name] = df[new_column_name].map(lambda x: x.upper())
-        ## change space to _
-        df[new_column_name] = df[new_column_name].map(lambda x: x.replace(" ", "_"))
-        ## change - to _
-        df[new_column_name] = df[new_column_name].map(lambda x: x.replace("-", "_"))
+        # 2. reformat district name, upper case, space and - to _, in a single pass over distinct names
+        df[new_column_name] = normalize_names(df[new_column_name])
 
         # 3. set index to the new column name
         if set_index:
@@ -39,11 +67,6 @@ def adm1_name(
     elif type(df) is pd.Series:
         df = df.rename(new_column_name)
         # 2. reformat district name
-        ## to upper case
-        df.index = df.index.map(lambda x: x.upper())
-        ## change space to _
-        df.index = df.index.map(lambda x: x.replace(" ", "_"))
-        ## change - to _
-        df.index = df.index.map(lambda x: x.replace("-", "_"))
+        df.index = pd.Index(normalize_names(df.index), name=df.index.name)
 
     return df
@@ -1,2 +1,7 @@
-from .eir_prevalence import get_eir_by_prevalence
-from .eir_prevalence import get_prevalence_by_eir
\ No newline at end of file
+from mbench._lazy import lazy_exports
+
+__getattr__, __dir__ = lazy_exports(__name__, {
+    "get_eir_by_prevalence": (".eir_prevalence", "get_eir_by_prevalence"),
+    "get_prevalence_by_eir": (".eir_prevalence", "get_prevalence_by_eir"),
+    "fit_prevalence_by_eir": (".eir_prevalence", "fit_prevalence_by_eir"),
+})
@@ -1,11 +1,151 @@
-from math import log10
+# log-linear relation of annual EIR and Pf prevalence, Beier et al. 1999
+# prevalence (%) = slope * log10(eir) + intercept
 
+import sys
 
-def get_prevalence_by_eir(eir):
-    prevalence = (24.2 * log10(eir) + 24.68) / 100
-    return prevalence
+import numpy as np
 
+from mbench.util.instrument import instrument
+from mbench.util.np_looper import numpy_native
 
-def get_eir_by_prevalence(prevalence):
-    eir = 10 ** ((prevalence * 100 - 24.68) / 24.2)
-    return eir
+SLOPE = 24.2
+INTERCEPT = 24.68
+
+
+def _is_pandas(x) -> bool:
+    """
+    pandas is only imported by fit_prevalence_by_eir, a pandas object can not exist before pandas was imported
+    """
+    pd = sys.modules.get("pandas")
+    return pd is not None and isinstance(x, (pd.Series, pd.DataFrame))
+
+
+def _clip(x, clip):
+    if clip is True:
+        clip = (0., 1.)
+    return x if clip is None or clip is False else np.clip(x, *clip)
+
+
+@instrument
+@numpy_native
+def get_prevalence_by_eir(eir, slope=SLOPE, intercept=INTERCEPT, clip=None):
+    """
+    vectorized, takes scalars, numpy arrays, pandas Series and DataFrames and returns the same type
+    :param eir: annual entomological inoculation rate, zero, negative and nan values give nan
+    :param slope: per log10 EIR, in percent, scalar or array broadcasting against eir (e.g. fitted per group)
+    :param intercept: in percent, scalar or array
+    :param clip: True to clip the prevalence to [0, 1], or (lower, upper)
+    :return: prevalence, as a proportion
+    """
+    if _is_pandas(eir):
+        log_eir = np.log10(eir.where(eir > 0).astype(float))
+    else:
+        eir = np.asarray(eir, dtype=float)
+        with np.errstate(invalid="ignore"):
+            log_eir = np.log10(np.where(eir > 0, eir, np.nan))
+    prevalence = (slope * log_eir + intercept) / 100
+    prevalence = _clip(prevalence, clip)
+    return prevalence[()] if isinstance(prevalence, np.ndarray) and prevalence.ndim == 0 else prevalence
+
+
+@instrument
+@numpy_native
+def get_eir_by_prevalence(prevalence, slope=SLOPE, intercept=INTERCEPT, clip=None):
+    """
+    inverse of get_prevalence_by_eir, vectorized the same way
+    :param prevalence: as a proportion, nan values give nan
+    :param slope: see get_prevalence_by_eir
+    :param intercept: see get_prevalence_by_eir
+    :param clip: True to clip the prevalence to [0, 1] before converting, or (lower, upper)
+    :return: annual EIR
+    """
+    if not _is_pandas(prevalence):
+        prevalence = np.asarray(prevalence, dtype=float)
+    eir = 10 ** ((_clip(prevalence, clip) * 100 - intercept) / slope)
+    return eir[()] if isinstance(eir, np.ndarray) and eir.ndim == 0 else eir
+
+
+def _least_squares(x, y, starts, counts):
+    """
+    closed form slope and intercept of y on x in contiguous groups, along the last axis
+    """
+    def total(values):
+        return np.add.reduceat(values, starts, axis=-1)
+
+    sx, sy = total(x), total(y)
+    sxx, sxy = total(x * x), total(x * y)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        slope = (counts * sxy - sx * sy) / (counts * sxx - sx * sx)
+        intercept = (sy - slope * sx) / counts
+    degenerate = np.isclose(counts * sxx - sx * sx, 0, atol=1e-12 * np.maximum(counts * sxx, 1))
+    slope[degenerate] = np.nan
+    intercept[degenerate] = np.nan
+    return slope, intercept
+
+
+@instrument
+def fit_prevalence_by_eir(
+        df,
+        by=None,
+        eir: str = "eir",
+        prevalence: str = "prevalence",
+        n_boot: int = 1000,
+        ci: float = 0.95,
+        seed=None,
+        chunk_size: int = 100,
+):
+    """
+    fit slope and intercept of get_prevalence_by_eir by least squares, for every group at once, with percentile
+    bootstrap confidence intervals (rows are resampled within their group)
+    e.g. fit_prevalence_by_eir(pd.read_csv("eir.csv"), by=["Country", "year"])
+    :param df: survey table, rows with a non positive or missing eir or prevalence are dropped
+    :param by: column name or list of column names to fit separately, None for one pooled fit
+    :param eir: column of the annual EIR
+    :param prevalence: column of the prevalence, as a proportion
+    :param n_boot: bootstrap resamples, 0 to skip the intervals
+    :param ci: confidence level of the intervals
+    :param seed: seed or numpy Generator
+    :param chunk_size: resamples evaluated together, bounds memory to chunk_size x rows
+    :return: DataFrame with n, slope, intercept and their lower and upper bounds, one row per group
+    """
+    import pandas as pd  # pylint: disable=import-outside-toplevel
+
+    valid = (df[eir] > 0) & df[prevalence].notna()
+    data = df.loc[valid]
+    x = np.log10(data[eir].to_numpy(dtype=float))
+    y = data[prevalence].to_numpy(dtype=float) * 100
+    if by is None:
+        codes, groups = np.zeros(len(data), dtype=np.intp), pd.Index(["all"])
+    else:
+        grouped = data.groupby(by, sort=True)
+        # rows with a missing group key are numbered nan, and dropped
+        codes, groups = grouped.ngroup().fillna(-1).to_numpy().astype(np.intp), grouped.size().index
+    keep = codes >= 0
+    order = np.argsort(codes[keep], kind="stable")
+    x, y, codes = x[keep][order], y[keep][order], codes[keep][order]
+    counts = np.bincount(codes, minlength=len(groups))
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+
+    result = pd.DataFrame(index=groups)
+    result["n"] = counts
+    result["slope"], result["intercept"] = _least_squares(x, y, starts, counts)
+    if n_boot <= 0:
+        return result
+
+    rng = np.random.default_rng(seed)
+    row_start, row_count = starts[codes], counts[codes]
+    slopes, intercepts = [], []
+    for first in range(0, n_boot, chunk_size):
+        size = min(chunk_size, n_boot - first)
+        resample = row_start + (rng.random((size, len(x))) * row_count).astype(np.intp)
+        boot_slope, boot_intercept = _least_squares(x[resample], y[resample], starts, counts)
+        slopes.append(boot_slope)
+        intercepts.append(boot_intercept)
+    q = [(1 - ci) / 2, (1 + ci) / 2]
+    for name, draws in (("slope", slopes), ("intercept", intercepts)):
+        bounds = np.full((2, len(groups)), np.nan)
+        draws = np.concatenate(draws)
+        finite = np.isfinite(draws).any(axis=0)
+        bounds[:, finite] = np.nanquantile(draws[:, finite], q, axis=0)
+        result[name + "_low"], result[name + "_high"] = bounds
+    return result
@@ -0,0 +1,109 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from mbench.intervention.efficacy import Converter
+from mbench.util.instrument import instrument
+
+NET_TYPES = ("itn", "pbo")
+
+# file suffix -> export format
+_FORMATS = {
+    ".parquet": "parquet",
+    ".feather": "feather",
+    ".arrow": "feather",
+    ".csv": "csv",
+}
+
+
+@instrument
+def efficacy_table(resistance, converter: Converter = None, net_types=NET_TYPES) -> pd.DataFrame:
+    """
+    net efficacy parameters for every resistance level and net type, computed in one vectorized pass
+    :param resistance: 1d array of vector resistance, 1 - bioassay mortality
+    :param converter: Converter or Converter_2022, default to Converter()
+    :param net_types: net types to include, "itn" and / or "pbo"
+    :return: pandas DataFrame with resistance, mortality, net_type, r, r_decay, d, s and gamma columns
+    """
+    converter = Converter() if converter is None else converter
+    resistance = np.asarray(resistance, dtype=float).ravel()
+    mortality = 1 - resistance
+    outputs = ("r_{}", "r_{}_decay", "d_{}", "s_{}", "gamma_{}")
+    # only the chain of the requested net types is evaluated
+    values = converter.evaluate(mortality, [output.format(net) for net in net_types for output in outputs])
+
+    frames = []
+    for i, net in enumerate(net_types):
+        r, r_decay, d, s, gamma = values[i * len(outputs):(i + 1) * len(outputs)]
+        frames.append(pd.DataFrame({
+            "resistance": resistance,
+            "mortality": mortality,
+            "net_type": net,
+            "r": r,
+            "r_decay": r_decay,
+            "d": d,
+            "s": s,
+            "gamma": gamma,
+        }))
+    efficacy = pd.concat(frames, ignore_index=True)
+    efficacy["net_type"] = pd.Categorical(efficacy["net_type"], categories=list(net_types))
+    return efficacy
+
+
+@instrument
+def parameter_table(df: pd.DataFrame, resistance, converter: Converter = None, net_types=NET_TYPES) -> pd.DataFrame:
+    """
+    combined district x resistance x net type parameter table for the imperial model (ICDMM) runs
+    :param df: district parameter table, e.g. gha indexed by adm1
+    :param resistance: 1d array of vector resistance levels
+    :param converter: Converter or Converter_2022, default to Converter()
+    :param net_types: net types to include
+    :return: pandas DataFrame, one row per district, resistance and net type, with typed columns
+    """
+    districts = df.reset_index()
+    efficacy = efficacy_table(resistance, converter, net_types)
+    n_districts, n_efficacy = len(districts), len(efficacy)
+    table = pd.concat([
+        districts.iloc[np.repeat(np.arange(n_districts), n_efficacy)].reset_index(drop=True),
+        efficacy.iloc[np.tile(np.arange(n_efficacy), n_districts)].reset_index(drop=True),
+    ], axis=1)
+    return _typed(table)
+
+
+def _typed(table: pd.DataFrame) -> pd.DataFrame:
+    """
+    string columns to categoricals, so that the columnar files store them as dictionaries
+    """
+    table = table.copy()
+    for column in table.columns:
+        dtype = table[column].dtype
+        if dtype == object or pd.api.types.is_string_dtype(dtype):
+            table[column] = table[column].astype("category")
+    return table
+
+
+@instrument
+def export(table: pd.DataFrame, path: str, fmt: str = None, chunksize: int = 100000):
+    """
+    write the parameter table to a columnar file for the R workers
+    :param table: output of parameter_table
+    :param path: output path, the format is inferred from the suffix (.parquet, .feather / .arrow or .csv)
+    :param fmt: "parquet", "feather" (Arrow IPC, uncompressed so that it can be memory mapped) or "csv"
+    :param chunksize: rows written at once in csv format
+    :return: path
+    """
+    if fmt is None:
+        fmt = _FORMATS.get(os.path.splitext(path)[1].lower())
+    if fmt == "parquet":
+        table.to_parquet(path, index=False)
+    elif fmt == "feather":
+        table.reset_index(drop=True).to_feather(path, compression="uncompressed")
+    elif fmt == "csv":
+        for start in range(0, max(len(table), 1), chunksize):
+            table.iloc[start:start + chunksize].to_csv(
+                path, mode="w" if start == 0 else "a", header=start == 0, index=False
+            )
+    else:
+        raise ValueError("unknown export format {} for {}".format(fmt, path))
+    return path
@@ -1,13 +1,114 @@
+import gzip
+import itertools
+import math
+import multiprocessing
+import os
+
 from lxml import etree
+from mbench.util.instrument import instrument
 from mbench.util.xml_import import load_xml_config
 import pandas as pd
 
+# dataframe column -> (xpath of the nodes in the scenario template, attribute set to the column value)
+# interventions are found by the id of their component, ITN and IRS, a template with a single deployment and no
+# component reference gets the ITN coverage
+# the net efficacy of bioassay_to_rds_array goes to a GVI component of id ITN, r as deterrency and d as preprandial
+# killing, s = 1 - r - d follows from them, add patches for other templates or for PBO nets
+DEFAULT_PATCHES = {
+    "eir": ("//entomology", "scaledAnnualEIR"),
+    "itn_cov": ("//interventions/human/deployment[component/@id='ITN' or not(component)]//deploy", "coverage"),
+    "irs_cov": ("//interventions/human/deployment[component/@id='IRS']//deploy", "coverage"),
+    "r_itn": ("//interventions/human/component[@id='ITN']//anophelesParams/deterrency", "value"),
+    "d_itn": ("//interventions/human/component[@id='ITN']//anophelesParams/preprandialKillingEffect", "value"),
+}
+
+# state of the current process, set by _init_worker
+_WORKER = {}
+
+
+def _init_worker(template: bytes, patches: dict):
+    """
+    parse the template once per process and resolve the patched nodes once, with their original attribute values
+    """
+    tree = etree.ElementTree(etree.fromstring(template))
+    targets = {}
+    for column, (xpath, attribute) in patches.items():
+        nodes = etree.XPath(xpath)(tree)
+        targets[column] = [(node, attribute, node.get(attribute)) for node in nodes]
+    _WORKER["tree"] = tree
+    _WORKER["targets"] = targets
+
+
+def _write_scenario(task):
+    """
+    patch the nodes of the template tree in place and write it, values which are nan keep the template value
+    :param task: (output path, compress, dict of column to value)
+    :return: output path
+    """
+    path, compress, values = task
+    for column, value in values.items():
+        missing = value is None or (isinstance(value, float) and math.isnan(value))
+        for node, attribute, original in _WORKER["targets"][column]:
+            if not missing:
+                node.set(attribute, str(value))
+            elif original is None:
+                node.attrib.pop(attribute, None)
+            else:
+                node.set(attribute, original)
+    opener = gzip.open if compress else open
+    with opener(path, "wb") as f:
+        _WORKER["tree"].write(f, xml_declaration=True, encoding="UTF-8")
+    return path
+
 
-def export(df: pd.DataFrame):
+@instrument
+def export(
+        df: pd.DataFrame,
+        template_path: str,
+        out_dir: str,
+        prefix: str = "",
+        patches: dict = None,
+        processes: int = None,
+        compress: bool = False,
+        chunksize: int = 16,
+):
     """
-    From generated pandas dataframe to xml configuration
-    :param df: computed pandas dataframe
-    :return:
+    From generated pandas dataframe to xml configuration, one OpenMalaria scenario file per row
+    The template is parsed once per process, the nodes to patch are located once with precompiled xpaths, and each
+    row only rewrites those attributes before serializing the tree.
+    :param df: computed pandas dataframe, e.g. the district parameter table indexed by adm1
+    :param template_path: OpenMalaria scenario used as template, loaded with load_xml_config
+    :param out_dir: output directory, created if needed
+    :param prefix: file name prefix, files are named prefix + index + ".xml"
+    :param patches: dict of column to (xpath, attribute), default to DEFAULT_PATCHES, columns absent from df are
+    skipped
+    :param processes: number of worker processes, None or 1 to write in the current process
+    :param compress: write gzip compressed .xml.gz files
+    :param chunksize: rows sent to a worker at once, rows are handed to the pool in batches of a few chunks per
+    worker so that the tasks in flight stay bounded
+    :return: pandas Series of written file paths, indexed like df
     """
-    return df
+    patches = {
+        column: patch for column, patch in (DEFAULT_PATCHES if patches is None else patches).items()
+        if column in df.columns
+    }
+    template = etree.tostring(load_xml_config(template_path), xml_declaration=True, encoding="UTF-8")
+    os.makedirs(out_dir, exist_ok=True)
+    suffix = ".xml.gz" if compress else ".xml"
 
+    columns = list(patches)
+    tasks = (
+        (os.path.join(out_dir, "{}{}{}".format(prefix, name, suffix)), compress, dict(zip(columns, values)))
+        for name, values in zip(df.index, df[columns].itertuples(index=False, name=None))
+    )
+    if processes is None or processes <= 1:
+        _init_worker(template, patches)
+        paths = [_write_scenario(task) for task in tasks]
+    else:
+        # Pool.imap would consume every task up front
+        paths = []
+        batch_size = 4 * processes * chunksize
+        with multiprocessing.Pool(processes, initializer=_init_worker, initargs=(template, patches)) as pool:
+            for batch in iter(lambda: list(itertools.islice(tasks, batch_size)), []):
+                paths.extend(pool.imap(_write_scenario, batch, chunksize=chunksize))
+    return pd.Series(paths, index=df.index, name="scenario")
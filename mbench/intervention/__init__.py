@@ -1 +1,6 @@
-from .efficacy import Converter
+from mbench._lazy import lazy_exports
+
+__getattr__, __dir__ = lazy_exports(__name__, {
+    "efficacy": (".efficacy", None),
+    "Converter": (".efficacy", "Converter"),
+})
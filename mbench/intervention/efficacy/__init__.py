@@ -1 +1,2 @@
 from .converter import Converter, Converter_2022
+from .tabulated import TabulatedConverter
@@ -2,18 +2,238 @@
 # resistance on the efficacy and effectiveness of bednets for malaria control in Africa. ELife, 5(AUGUST),
 # 1–26. https://doi.org/10.7554/eLife.16090.001
 
-import math
+import collections
+import functools
+import operator
 
+import numpy as np
+import pandas as pd
 from scipy.special import expit
 
+from mbench.util.instrument import instrument
+from mbench.util.np_looper import numpy_native
+
+# names of the r/d/s outputs, in the order of the tuples returned by Converter.bioassay_to_rds
+RDS_FIELDS = (
+    'r_itn', 'r_itn_decay', 'd_itn', 's_itn',
+    'r_pbo', 'r_pbo_decay', 'd_pbo', 's_pbo',
+)
+# order of the first axis of Converter.decay_curves
+DECAY_FIELDS = ('r', 'd', 's')
+# names of the intermediate outputs, in the order of pyrethroid_outputs / pbo_outputs
+VERBOSE_FIELDS = (
+    'bioassay_itn', 'l_itn', 'm_itn', 'k_itn', 'j_itn', 'j_itn_d', 'k_itn_d', 'l_itn_d',
+    'bioassay_pbo', 'l_pbo', 'm_pbo', 'k_pbo', 'j_pbo', 'j_pbo_d', 'k_pbo_d', 'l_pbo_d',
+)
+# steps of the chain after the hut trial mortality l, the same for both nets, {} is the net
+# output name -> (converter method, inputs)
+_CHAIN = {
+    'm_{}': ('ratio_of_mosquitoes_entering_hut_to_without_net', ('l_{}',)),
+    'k_{}': ('proportion_of_mosquitoes_successfully_feed_upon_entering', ('l_{}',)),
+    'j_{}': ('proportion_of_mosquitoes_exiting_without_feeding', ('l_{}', 'k_{}')),
+    'j_{}_d': ('proportion_of_mosquitoes_entering_hut_exiting_without_feeding_accounting_deterrence', ('m_{}', 'j_{}')),
+    'k_{}_d': ('proportion_of_mosquitoes_successfully_feed_upon_entering_accounting_deterrence', ('m_{}', 'k_{}')),
+    'l_{}_d': ('proportion_of_mosquitoes_dead_accounting_deterrence', ('m_{}', 'l_{}')),
+    'r_{}': ('repeating', ('k_{}_d', 'j_{}_d', 'l_{}_d')),
+    'd_{}': ('dying', ('k_{}_d', 'j_{}_d', 'l_{}_d')),
+    's_{}': ('feeding', ('k_{}_d',)),
+    'gamma_{}': ('gamma_p', ('l_{}',)),
+    'r_{}_decay': ('r_p', ('r_{}', 'gamma_{}')),
+}
+
+
+# first steps through the mortality_pyrethroid_to_mortality_hut hook, for converters overriding the hook without
+# declaring its steps in _HUT_STEPS
+_HUT_HOOK = {
+    '_hut': ('mortality_pyrethroid_to_mortality_hut', ('bioassay_itn',)),
+    'l_itn': (operator.itemgetter(0), ('_hut',)),
+    'bioassay_pbo': (operator.itemgetter(1), ('_hut',)),
+    'l_pbo': (operator.itemgetter(2), ('_hut',)),
+}
+
+
+def _defined_by(cls, name: str):
+    """
+    class of the mro of cls defining the attribute name
+    """
+    return next(base for base in cls.__mro__ if name in vars(base))
+
+
+@functools.lru_cache(maxsize=None)
+def _graph(cls) -> dict:
+    """
+    dependency graph of the outputs of a converter class, the chain starts from the input bioassay_itn
+    the hut trial mortality of both nets is computed by the steps in cls._HUT_STEPS, so the pbo steps only run for pbo
+    outputs, unless a subclass overrides mortality_pyrethroid_to_mortality_hut alone, then by the hook
+    :return: dict of output name -> (converter method name or function of the inputs, input names)
+    """
+    hook = 'mortality_pyrethroid_to_mortality_hut'
+    graph = dict(cls._HUT_STEPS if _defined_by(cls, '_HUT_STEPS') is _defined_by(cls, hook) else _HUT_HOOK)
+    for net in ('itn', 'pbo'):
+        for name, (method, inputs) in _CHAIN.items():
+            graph[name.format(net)] = (method, tuple(value.format(net) for value in inputs))
+    return graph
+
+
+@functools.lru_cache(maxsize=None)
+def _plan(cls, outputs: tuple) -> tuple:
+    """
+    steps of the dependency graph needed for outputs, each after its inputs
+    :return: tuple of (output name, method, input names)
+    """
+    graph = _graph(cls)
+    names = ('bioassay_itn',) + tuple(name for name in graph if not name.startswith('_'))
+    unknown = [name for name in outputs if name not in names]
+    if unknown:
+        raise ValueError('unknown outputs {}, expected some of {}'.format(unknown, names))
+    steps, seen = [], {'bioassay_itn'}
+
+    def visit(name):
+        if name in seen:
+            return
+        seen.add(name)
+        method, inputs = graph[name]
+        for value in inputs:
+            visit(value)
+        steps.append((name, method, inputs))
+
+    for name in outputs:
+        visit(name)
+    return tuple(steps)
+
+
+def _ignore_converter(function):
+    """
+    step function of the converter and the inputs, for static methods and plain functions of the inputs
+    """
+    return lambda _, *args: function(*args)
+
+
+@functools.lru_cache(maxsize=None)
+def _compile(cls, outputs: tuple) -> tuple:
+    """
+    _plan resolved once per converter class and outputs, for Converter.evaluate
+    the values are held in a list, the input at slot 0 then the result of each step in order
+    :return: steps as (function of the converter and the inputs, number of inputs, input slots padded to 3), slots of
+    the outputs, named tuple type of the result
+    """
+    slots = {'bioassay_itn': 0}
+    steps = []
+    for name, method, inputs in _plan(cls, outputs):
+        if not isinstance(method, str):
+            function = _ignore_converter(method)
+        elif isinstance(vars(_defined_by(cls, method))[method], staticmethod):
+            function = _ignore_converter(getattr(cls, method))
+        else:
+            function = getattr(cls, method)
+        positions = tuple(slots[value] for value in inputs)
+        steps.append((function, len(positions)) + (positions + (0, 0, 0))[:3])
+        slots[name] = len(slots)
+    return tuple(steps), tuple(slots[name] for name in outputs), collections.namedtuple('Efficacy', outputs)
+
+
+def _pack_outputs(columns: dict, index=None, as_frame: bool = False):
+    """
+    pack named output arrays into a numpy structured array, or a pandas DataFrame
+    :param columns: dict of output name to array, arrays are broadcast to a common shape
+    :param index: index of the DataFrame, only used when as_frame is True
+    :param as_frame: return a pandas DataFrame instead of a structured array
+    :return: structured array with the broadcast shape, or a DataFrame with one row per element
+    """
+    arrays = np.broadcast_arrays(*[np.asarray(value, dtype=float) for value in columns.values()])
+    if as_frame:
+        return pd.DataFrame(
+            {name: array.ravel() for name, array in zip(columns, arrays)},
+            index=index
+        )
+    shape = arrays[0].shape if arrays else ()
+    result = np.empty(shape, dtype=[(name, float) for name in columns])
+    for name, array in zip(columns, arrays):
+        result[name] = array
+    return result
+
+
+def _solve_bioassay(evaluate, grid, values, target, tol=1e-10, max_iter=100):
+    """
+    vectorized root finding of evaluate(mortality) == target on [grid[0], grid[-1]]
+    the tabulated values are split into monotone segments, each target is bracketed in the first segment covering it
+    (i.e. the lowest mortality solution) and then refined with bisection
+    :param evaluate: vectorized function of bioassay mortality
+    :param grid: increasing 1d array of mortalities
+    :param values: evaluate(grid), exact or tabulated
+    :param target: 1d array of targets
+    :param tol: width of the final bracket
+    :param max_iter: maximum number of bisection steps
+    :return: mortality, nan where the target can not be reached, and a boolean array of reachable targets
+    """
+    lower = np.full(target.shape, np.nan)
+    upper = np.full(target.shape, np.nan)
+    reachable = np.zeros(target.shape, dtype=bool)
+
+    increasing = np.diff(values) >= 0
+    boundaries = np.concatenate(([0], np.flatnonzero(increasing[1:] != increasing[:-1]) + 1, [len(grid) - 1]))
+    for start, stop in zip(boundaries[:-1], boundaries[1:]):
+        segment = values[start:stop + 1]
+        covered = ~reachable & (target >= segment.min()) & (target <= segment.max())
+        if not covered.any():
+            continue
+        if increasing[start]:
+            position = np.searchsorted(segment, target[covered], side='left')
+            position = start + np.clip(position, 1, len(segment) - 1)
+        else:
+            position = np.searchsorted(segment[::-1], target[covered], side='left')
+            position = stop - np.clip(position, 1, len(segment) - 1) + 1
+        lower[covered] = grid[position - 1]
+        upper[covered] = grid[position]
+        reachable |= covered
+
+    lower, upper, goal = lower[reachable], upper[reachable], target[reachable]
+    # collapse brackets with a solution on one end, then keep track of the side of the target at the lower end
+    at_lower = evaluate(lower) == goal
+    at_upper = evaluate(upper) == goal
+    upper = np.where(at_lower, lower, upper)
+    lower = np.where(at_upper & ~at_lower, upper, lower)
+    below_at_lower = evaluate(lower) < goal
+    for _ in range(max_iter):
+        if len(goal) == 0 or np.max(upper - lower) <= tol:
+            break
+        middle = (lower + upper) / 2
+        move_lower = (evaluate(middle) < goal) == below_at_lower
+        lower = np.where(move_lower, middle, lower)
+        upper = np.where(move_lower, upper, middle)
+
+    mortality = np.full(target.shape, np.nan)
+    mortality[reachable] = (lower + upper) / 2
+    return mortality, reachable
+
+
+def _solve_target(evaluate, grid, values, target, tol, max_iter):
+    """
+    shape handling around _solve_bioassay, keep the shape of array targets and the index of Series targets
+    """
+    target_array = np.asarray(target, dtype=float)
+    mortality, reachable = _solve_bioassay(evaluate, grid, values, target_array.ravel(), tol, max_iter)
+    mortality = mortality.reshape(target_array.shape)
+    reachable = reachable.reshape(target_array.shape)
+    if isinstance(target, pd.Series):
+        return pd.Series(mortality, index=target.index), pd.Series(reachable, index=target.index)
+    return mortality, reachable
+
 
 class Converter:
+    # steps of mortality_pyrethroid_to_mortality_hut, output name -> (method, input names), see evaluate
+    _HUT_STEPS = {
+        'l_itn': ('mortality_bioassay_to_hut_trail', ('bioassay_itn',)),
+        'bioassay_pbo': ('mortality_pbo_bioassay', ('bioassay_itn',)),
+        'l_pbo': ('mortality_bioassay_to_hut_trail', ('bioassay_pbo',)),
+    }
+
     def __init__(self,
                  species='gambiae',
                  verbose=False
                  ):
         self.half_life_itn = 365 * 2.65
-        self.species = ''
+        self.species = species
         self.verbose = verbose
 
         if species == 'funestus':
@@ -49,6 +269,39 @@ class Converter:
 
         self.r_m = 0.24
 
+    def parameters(self):
+        """
+        numeric parameters of the converter, used to key tabulated and cached results
+        :return: dict of parameter name to value
+        """
+        return {
+            name: value for name, value in vars(self).items()
+            if name not in ('species', 'verbose')
+        }
+
+    def evaluate(self, mortality_pyrethroid_bioassay, outputs=RDS_FIELDS):
+        """
+        evaluate only the steps of the chain the outputs depend on, e.g. outputs=('d_pbo', 'r_itn') skips the
+        feeding and decay of both nets, the steps are resolved once per converter class and outputs, see _compile
+        :param mortality_pyrethroid_bioassay: scalar or numpy array
+        :param outputs: names from RDS_FIELDS, VERBOSE_FIELDS, gamma_itn or gamma_pbo
+        :return: named tuple with one field per output, in the order of outputs
+        """
+        steps, slots, record = _compile(type(self), tuple(outputs))
+        values = [mortality_pyrethroid_bioassay]
+        append = values.append
+        for function, arity, i, j, k in steps:
+            if arity == 1:
+                append(function(self, values[i]))
+            elif arity == 2:
+                append(function(self, values[i], values[j]))
+            elif arity == 3:
+                append(function(self, values[i], values[j], values[k]))
+            else:
+                append(function(self))
+        return record._make([values[i] for i in slots])
+
+    @numpy_native
     def mortality_bioassay_to_hut_trail(self, mortality_bioassay):
         """
         formula 2, from x to l
@@ -57,6 +310,7 @@ class Converter:
         """
         return expit(self.alpha1 + self.alpha2 * (mortality_bioassay - self.tao))
 
+    @numpy_native
     def mortality_pbo_bioassay(self, mortality_pyrethroid_bioassay):
         """
         formula 4, from x to f
@@ -66,6 +320,7 @@ class Converter:
         return expit(self.beta1 + self.beta2 * (mortality_pyrethroid_bioassay - self.tao) / (
                 1 + self.beta3 * (mortality_pyrethroid_bioassay - self.tao)))
 
+    @numpy_native
     def ratio_of_mosquitoes_entering_hut_to_without_net(self, mortality_hut_trail):
         """
         formula 8, from l to m_p
@@ -78,13 +333,14 @@ class Converter:
                 self.delta3 * (mortality_hut_trail - self.tao) * (mortality_hut_trail - self.tao)
         )
 
+    @numpy_native
     def proportion_of_mosquitoes_successfully_feed_upon_entering(self, mortality_hut_trail):
         """
         formula 11, from l to k_p
         :param mortality_hut_trail:
         :return:
         """
-        return self.theta1 * math.exp(self.theta2 * (1 - mortality_hut_trail - self.tao))
+        return self.theta1 * np.exp(self.theta2 * (1 - mortality_hut_trail - self.tao))
 
     @staticmethod
     def proportion_of_mosquitoes_exiting_without_feeding(p_mortality, p_feed):
@@ -147,6 +403,7 @@ class Converter:
         """
         return (1 - k_p_d / self.k_0) * (l_p_d / (j_p_d + l_p_d))
 
+    @numpy_native
     def feeding(self, k_p_d):
         """
         formula 14, calculating s_p_0
@@ -155,11 +412,12 @@ class Converter:
         """
         return k_p_d / self.k_0
 
+    @numpy_native
     def gamma_p(self, mortality_hut_trail):
         """
         formula 16, calculating gamma_p, the decay parameter
         :param mortality_hut_trail:
-        :return:
+        :return: decay rate per day, r_p and decay_curves apply it to time in days
         """
         return expit(self.mu_p + self.rho_p * (mortality_hut_trail - self.tao))
 
@@ -171,7 +429,58 @@ class Converter:
         :return:
         """
         # suppose life years of itn is 3 year, remind to change this if using other parameters
-        return (r_p_0 - self.r_m) * math.exp(-1 * gamma_p_ * self.half_life_itn) + self.r_m
+        return (r_p_0 - self.r_m) * np.exp(-1 * gamma_p_ * self.half_life_itn) + self.r_m
+
+    @instrument(items=1)
+    def decay_curves(self,
+                     mortality_pyrethroid_bioassay,
+                     days: int = 3 * 365,
+                     net: str = 'itn',
+                     dtype=np.float64,
+                     path: str = None,
+                     chunk_size: int = 1024
+                     ):
+        """
+        daily repeating, dying and feeding probabilities of a net over a distribution cycle, formula 16-17
+        r_p(t) = (r_p_0 - r_m) * exp(-gamma_p * t) + r_m, d_p(t) = d_p_0 * exp(-gamma_p * t), s_p(t) = 1 - r_p - d_p
+        with t in days, the unit of gamma_p in r_p, so r_p(half_life_itn) is r_itn_decay / r_pbo_decay. gamma_p is
+        0.02 to 0.2 per day, the curves are within 1e-3 of their limit after a year
+        :param mortality_pyrethroid_bioassay: 1d numpy array or pandas Series of bioassay mortalities
+        :param days: number of days, t = 0, 1, ..., days - 1
+        :param net: 'itn' for pyrethroid only nets or 'pbo' for PBO nets
+        :param dtype: dtype of the output, e.g. np.float32 to halve the memory
+        :param path: if given, the output is a memory mapped .npy file at this path
+        :param chunk_size: number of mortalities computed at once, bounds the temporaries
+        :return: array of shape (3, mortality, day), the first axis ordered as DECAY_FIELDS
+        """
+        if net not in ('itn', 'pbo'):
+            raise ValueError('net should be itn or pbo, got {}'.format(net))
+        mortality = np.asarray(mortality_pyrethroid_bioassay, dtype=float).ravel()
+        r_0, d_0, gamma = self.evaluate(mortality, ('r_' + net, 'd_' + net, 'gamma_' + net))
+        gamma = gamma.astype(dtype)
+        r_0 = (r_0 - self.r_m).astype(dtype)
+        d_0 = d_0.astype(dtype)
+
+        shape = (len(DECAY_FIELDS), len(mortality), days)
+        if path is None:
+            curves = np.empty(shape, dtype=dtype)
+        else:
+            curves = np.lib.format.open_memmap(path, mode='w+', dtype=dtype, shape=shape)
+        t = np.arange(days, dtype=dtype)
+        for start in range(0, len(mortality), chunk_size):
+            rows = slice(start, start + chunk_size)
+            r, d, s = curves[0, rows], curves[1, rows], curves[2, rows]
+            # exp(-gamma * t) is computed once into s, then scaled into r and d
+            np.multiply(-gamma[rows, None], t, out=s)
+            np.exp(s, out=s)
+            np.multiply(r_0[rows, None], s, out=r)
+            r += self.r_m
+            np.multiply(d_0[rows, None], s, out=d)
+            np.subtract(1, r, out=s)
+            s -= d
+        if path is not None:
+            curves.flush()
+        return curves
 
     def mortality_pyrethroid_to_mortality_hut(self, mortality_pyrethroid_bioassay):
         # from pyrethroid mortality in bioassay compute mortality in pyrethroid hut trail using eq 4
@@ -184,6 +493,7 @@ class Converter:
 
         return mortality_pyrethroid_hut_trail, mortality_pbo_bioassay, mortality_pbo_hut_trail
 
+    @instrument(items=None)
     def bioassay_to_rds(self, mortality_pyrethroid_bioassay):
         """
         from mortality_pyrethroid_bioassay calculate efficacy results for bednets and PBO nets
@@ -319,12 +629,64 @@ class Converter:
         else:
             return rds_regular, rds_pbo
 
+    @instrument(items=1)
+    def bioassay_to_rds_array(self, mortality_pyrethroid_bioassay, as_frame: bool = None, outputs=None):
+        """
+        vectorized version of bioassay_to_rds, evaluate the chain for an array of bioassay mortalities at once
+        :param mortality_pyrethroid_bioassay: numpy array of any shape, or pandas Series
+        :param as_frame: return a pandas DataFrame, default to True for pandas Series inputs
+        :param outputs: names of the fields, see evaluate, default to RDS_FIELDS (plus VERBOSE_FIELDS if verbose)
+        :return: structured array with the same shape as the input and one field per output, or a DataFrame with
+        those columns
+        """
+        index = None
+        if isinstance(mortality_pyrethroid_bioassay, pd.Series):
+            index = mortality_pyrethroid_bioassay.index
+            if as_frame is None:
+                as_frame = True
+        mortality = np.asarray(mortality_pyrethroid_bioassay, dtype=float)
+
+        if outputs is None:
+            outputs = RDS_FIELDS + VERBOSE_FIELDS if self.verbose else RDS_FIELDS
+        values = self.evaluate(mortality, outputs)
+        columns = {name: np.nan if value is None else value for name, value in zip(values._fields, values)}
+        return _pack_outputs(columns, index=index, as_frame=bool(as_frame))
+
+    @instrument(items=1)
+    def rds_to_bioassay(self, target, output: str = 'd_itn', n_grid: int = 1025, tol: float = 1e-10,
+                        max_iter: int = 100):
+        """
+        inverse of bioassay_to_rds_array, find the bioassay mortality giving a target value of one output
+        when the output is not monotone in mortality the lowest mortality solution is returned
+        :param target: scalar, numpy array or pandas Series of target values
+        :param output: name of the output, one of RDS_FIELDS
+        :param n_grid: size of the grid used to bracket the solutions
+        :param tol: tolerance on the mortality
+        :param max_iter: maximum number of bisection steps
+        :return: mortality and a boolean mask of targets which can be reached, mortality is nan where it can not
+        """
+        if output not in RDS_FIELDS:
+            raise ValueError('unknown output {}, expected one of {}'.format(output, RDS_FIELDS))
+        grid = np.linspace(0., 1., n_grid)
+        outputs = (output,)
+        values = self.evaluate(grid, outputs)[0]
+        return _solve_target(
+            lambda mortality: self.evaluate(mortality, outputs)[0],
+            grid, values, target, tol, max_iter
+        )
+
 
 class Converter_2022(Converter):
     """
     from the paper by Ellie
     https://doi.org/10.1016/S2542-5196(21)00296-5
     """
+    # no pbo bioassay, the pbo hut trial mortality follows from the pyrethroid one
+    _HUT_STEPS = {
+        'l_itn': ('mortality_bioassay_to_hut_trail', ('bioassay_itn',)),
+        'bioassay_pbo': (lambda: None, ()),
+        'l_pbo': ('mortality_hut_trail_from_pyrethroid_to_pbo', ('l_itn',)),
+    }
 
     def __init__(self, species='Gambiae', verbose=False):
         super().__init__(species, verbose)
@@ -348,30 +710,46 @@ class Converter_2022(Converter):
         self.theta1 = 0.04
         self.theta2 = 4.66
 
+    @numpy_native
     def mortality_bioassay_to_hut_trail(self, mortality_bioassay):
         """
-        mortality from bioassay to hut trail
-        :param mortality_bioassay:
+        mortality from bioassay to hut trail, 1 - 1 / (1 + ((1 - x) / alpha1) ** -alpha2)
+        evaluated as expit of the log of the power term, so that mortality 0 and 1 stay finite
+        :param mortality_bioassay: scalar or numpy array, clipped to [0, 1]
         :return: mortality hut trail
         """
-        power = -1.0 * self.alpha2
-        return 1 - 1 / (1 +
-                        ((1 - mortality_bioassay) / self.alpha1) ** power)
+        mortality_bioassay = np.clip(mortality_bioassay, 0., 1.)
+        with np.errstate(divide='ignore'):
+            log_power = -1.0 * self.alpha2 * (np.log1p(-mortality_bioassay) - np.log(self.alpha1))
+        return expit(log_power)
 
+    @numpy_native
     def mortality_hut_trail_from_pyrethroid_to_pbo(self, mortality_pyrethroid_hut_trail):
         """
         from l1 to l2
         :param mortality_pyrethroid_hut_trail:
         :return: mortality PBO hut trail
         """
-        return 1 / (1 + math.exp(-1 * (self.beta1 + self.beta2 * mortality_pyrethroid_hut_trail)))
+        return expit(self.beta1 + self.beta2 * mortality_pyrethroid_hut_trail)
 
+    @numpy_native
     def ratio_of_mosquitoes_entering_hut_to_without_net(self, mortality_hut_trail):
-        return self.delta1 * math.exp(
-            self.delta2 * (1 - math.exp((1 - mortality_hut_trail) * self.delta3)) / self.delta3)
+        """
+        from l to m_p, delta1 * exp(delta2 * (1 - exp((1 - l) * delta3)) / delta3)
+        :param mortality_hut_trail:
+        :return:
+        """
+        return self.delta1 * np.exp(
+            -1 * self.delta2 * np.expm1((1 - mortality_hut_trail) * self.delta3) / self.delta3)
 
+    @numpy_native
     def proportion_of_mosquitoes_successfully_feed_upon_entering(self, mortality_hut_trail):
-        return 1 - math.exp(self.theta1 * (1 - math.exp(self.theta2 * (1 - mortality_hut_trail))) / self.theta2)
+        """
+        from l to k_p, 1 - exp(theta1 * (1 - exp(theta2 * (1 - l))) / theta2)
+        :param mortality_hut_trail:
+        :return:
+        """
+        return -1 * np.expm1(-1 * self.theta1 * np.expm1(self.theta2 * (1 - mortality_hut_trail)) / self.theta2)
 
     def mortality_pyrethroid_to_mortality_hut(self, mortality_pyrethroid_bioassay):
         mortality_pyrethroid_hut_trail = self.mortality_bioassay_to_hut_trail(mortality_pyrethroid_bioassay)
@@ -0,0 +1,136 @@
+import numpy as np
+import pandas as pd
+
+from mbench.util.instrument import instrument
+from .converter import RDS_FIELDS, _pack_outputs, _solve_target
+
+# tables shared by every TabulatedConverter in the process, keyed by model version, species and parameters
+_TABLES = {}
+
+
+def _evaluate(converter, mortality):
+    """
+    exact converter outputs on a mortality grid
+    :param converter: Converter or Converter_2022
+    :param mortality: 1d numpy array
+    :return: 2d array, one row per mortality and one column per name in RDS_FIELDS
+    """
+    result = converter.bioassay_to_rds_array(mortality)
+    return np.stack([result[name] for name in RDS_FIELDS], axis=-1)
+
+
+def _tabulate(converter, tolerance, n_points, max_points):
+    """
+    tabulate converter outputs on a grid refined until linear interpolation is within tolerance
+    the interpolation error is checked at the midpoint of every interval, intervals above the tolerance are split
+    :return: grid (float64), table (float32) and the largest midpoint error of the final grid
+    """
+    grid = np.linspace(0., 1., n_points)
+    table = _evaluate(converter, grid).astype(np.float32)
+    while True:
+        midpoints = (grid[:-1] + grid[1:]) / 2
+        exact = _evaluate(converter, midpoints)
+        approx = (table[:-1].astype(float) + table[1:]) / 2
+        error = np.abs(approx - exact).max(axis=1)
+        refine = np.flatnonzero(error > tolerance)
+        if len(refine) == 0 or len(grid) + len(refine) > max_points:
+            break
+        grid = np.insert(grid, refine + 1, midpoints[refine])
+        table = np.insert(table, refine + 1, exact[refine].astype(np.float32), axis=0)
+    return grid, table, float(error.max())
+
+
+class TabulatedConverter:
+    """
+    lookup table backend for Converter and Converter_2022
+    outputs only depend on the bioassay mortality, so they are computed once on a dense mortality grid, stored as a
+    float32 table and queries are answered by linear interpolation
+    """
+
+    def __init__(self,
+                 converter,
+                 tolerance=1e-5,
+                 n_points=257,
+                 max_points=1 << 16
+                 ):
+        """
+        :param converter: Converter or Converter_2022 instance to tabulate
+        :param tolerance: maximum absolute interpolation error, checked at the midpoint of every grid interval
+        :param n_points: size of the initial uniform grid
+        :param max_points: upper bound of the refined grid, max_error may exceed tolerance when it is reached
+        """
+        self.converter = converter
+        self.tolerance = tolerance
+        key = (
+            type(converter).__name__,
+            converter.species,
+            tuple(sorted(converter.parameters().items())),
+            tolerance,
+            n_points,
+            max_points
+        )
+        if key not in _TABLES:
+            _TABLES[key] = _tabulate(converter, tolerance, n_points, max_points)
+        self.grid, self.table, self.max_error = _TABLES[key]
+
+        # one row per output, values and slopes of every interval, and the first interval of each uniform bucket
+        self._values = np.ascontiguousarray(self.table.T)
+        self._slopes = np.diff(self._values, axis=1)
+        self._n_buckets = 16 * len(self.grid)
+        self._bucket_start = np.searchsorted(
+            self.grid, np.arange(self._n_buckets + 1) / self._n_buckets, side='right') - 1
+
+    @property
+    def nbytes(self):
+        return self.grid.nbytes + self.table.nbytes
+
+    @instrument(items=1)
+    def bioassay_to_rds_array(self, mortality_pyrethroid_bioassay, as_frame: bool = None):
+        """
+        interpolated version of Converter.bioassay_to_rds_array
+        :param mortality_pyrethroid_bioassay: numpy array of any shape, or pandas Series, clipped to [0, 1]
+        :param as_frame: return a pandas DataFrame, default to True for pandas Series inputs
+        :return: structured array with one field per name in RDS_FIELDS, or a DataFrame with those columns
+        """
+        index = None
+        if isinstance(mortality_pyrethroid_bioassay, pd.Series):
+            index = mortality_pyrethroid_bioassay.index
+            if as_frame is None:
+                as_frame = True
+        mortality = np.clip(np.asarray(mortality_pyrethroid_bioassay, dtype=float), 0., 1.)
+        shape = mortality.shape
+        mortality = mortality.ravel()
+
+        # find the grid interval of each query, bucket by a uniform index first and only binary search the queries
+        # falling in buckets which contain a grid point
+        bucket = np.clip(np.nan_to_num(mortality) * self._n_buckets, 0, self._n_buckets - 1).astype(np.intp)
+        position = self._bucket_start[bucket]
+        ambiguous = np.flatnonzero(self._bucket_start[bucket + 1] != position)
+        position[ambiguous] = np.searchsorted(self.grid, mortality[ambiguous], side='right') - 1
+        position = np.clip(position, 0, len(self.grid) - 2)
+        weight = (mortality - self.grid[position]) / (self.grid[position + 1] - self.grid[position])
+
+        columns = {
+            name: (self._values[i][position] + weight * self._slopes[i][position]).reshape(shape)
+            for i, name in enumerate(RDS_FIELDS)
+        }
+        return _pack_outputs(columns, index=index, as_frame=bool(as_frame))
+
+    @instrument(items=1)
+    def rds_to_bioassay(self, target, output: str = 'd_itn', tol: float = 1e-10, max_iter: int = 100):
+        """
+        inverse of bioassay_to_rds_array, brackets the solutions on the refined grid and bisects with the exact converter
+        :param target: scalar, numpy array or pandas Series of target values
+        :param output: name of the output, one of RDS_FIELDS
+        :param tol: tolerance on the mortality
+        :param max_iter: maximum number of bisection steps
+        :return: mortality and a boolean mask of targets which can be reached, mortality is nan where it can not
+        """
+        if output not in RDS_FIELDS:
+            raise ValueError('unknown output {}, expected one of {}'.format(output, RDS_FIELDS))
+
+        def evaluate(mortality):
+            return self.converter.evaluate(mortality, (output,))[0]
+
+        # the refined grid is small, evaluate it exactly so targets on the edge of the range are not lost to rounding
+        return _solve_target(evaluate, self.grid, evaluate(self.grid), target, tol, max_iter)
@@ -0,0 +1,100 @@
+# Monte Carlo propagation of parameter uncertainty through the efficacy chain, parameter draws are set on a copy of
+# the converter as column vectors, so every step of bioassay_to_rds broadcasts to (draws x mortality)
+
+import copy
+
+import numpy as np
+import pandas as pd
+
+from .converter import RDS_FIELDS
+
+PARAMETER_NAMES = (
+    'alpha1', 'alpha2',
+    'beta1', 'beta2', 'beta3',
+    'delta1', 'delta2', 'delta3',
+    'theta1', 'theta2',
+    'mu_p', 'rho_p',
+    'k_0',
+)
+
+
+def with_parameter_draws(converter, draws, parameters=None):
+    """
+    copy of a converter with point estimates replaced by parameter draws
+    :param converter: Converter or Converter_2022
+    :param draws: pandas DataFrame with one column per parameter, or a 2d numpy array (draws x parameters)
+    :param parameters: parameter names of the array columns, required when draws is a numpy array
+    :return: converter evaluating to arrays with one row per draw
+    """
+    if isinstance(draws, pd.DataFrame):
+        parameters = list(draws.columns)
+        draws = draws.to_numpy(dtype=float)
+    else:
+        draws = np.asarray(draws, dtype=float)
+    if parameters is None or draws.ndim != 2 or draws.shape[1] != len(parameters):
+        raise ValueError('draws must be a 2d array with one named column per parameter')
+
+    known = converter.parameters()
+    unknown = [name for name in parameters if name not in known]
+    if unknown:
+        raise ValueError('unknown parameters {} for {}'.format(unknown, type(converter).__name__))
+
+    result = copy.copy(converter)
+    for i, name in enumerate(parameters):
+        setattr(result, name, draws[:, i:i + 1])
+    return result
+
+
+def iter_rds_draws(converter, draws, mortality, parameters=None, chunk_size=None, max_bytes=1 << 26):
+    """
+    evaluate bioassay_to_rds for every draw and mortality, in chunks of mortality
+    :param converter: Converter or Converter_2022
+    :param draws: pandas DataFrame or 2d numpy array of parameter draws, see with_parameter_draws
+    :param mortality: 1d array of bioassay mortalities
+    :param parameters: parameter names of the array columns
+    :param chunk_size: number of mortalities per chunk, by default derived from max_bytes
+    :param max_bytes: approximate memory budget of one chunk, including intermediates of the chain
+    :return: generator of (slice of mortality, structured array of shape (draws, chunk))
+    """
+    drawn = with_parameter_draws(converter, draws, parameters)
+    mortality = np.asarray(mortality, dtype=float).ravel()
+    n_draws = len(draws)
+    if chunk_size is None:
+        # the chain keeps around four times as many temporaries as outputs alive
+        chunk_size = max(1, max_bytes // (n_draws * len(RDS_FIELDS) * 8 * 4))
+    for start in range(0, len(mortality), chunk_size):
+        chunk = slice(start, min(start + chunk_size, len(mortality)))
+        yield chunk, drawn.bioassay_to_rds_array(mortality[chunk])
+
+
+def rds_quantiles(converter,
+                  draws,
+                  mortality,
+                  q=(0.025, 0.5, 0.975),
+                  parameters=None,
+                  chunk_size=None,
+                  max_bytes=1 << 26
+                  ):
+    """
+    quantiles over parameter draws of every r/d/s output
+    :param converter: Converter or Converter_2022
+    :param draws: pandas DataFrame or 2d numpy array of parameter draws, see with_parameter_draws
+    :param mortality: 1d array of bioassay mortalities
+    :param q: quantiles to compute
+    :param parameters: parameter names of the array columns
+    :param chunk_size: number of mortalities per chunk
+    :param max_bytes: approximate memory budget of one chunk
+    :return: pandas DataFrame indexed by mortality, with (output, quantile) columns
+    """
+    mortality = np.asarray(mortality, dtype=float).ravel()
+    q = np.atleast_1d(np.asarray(q, dtype=float))
+    result = np.empty((len(mortality), len(RDS_FIELDS), len(q)))
+    for chunk, values in iter_rds_draws(converter, draws, mortality, parameters, chunk_size, max_bytes):
+        for i, name in enumerate(RDS_FIELDS):
+            result[chunk, i, :] = np.quantile(values[name], q, axis=0).T
+    columns = pd.MultiIndex.from_product([RDS_FIELDS, q], names=['output', 'quantile'])
+    return pd.DataFrame(
+        result.reshape(len(mortality), -1),
+        index=pd.Index(mortality, name='mortality'),
+        columns=columns
+    )
@@ -0,0 +1,8 @@
+from mbench._lazy import lazy_exports
+
+__getattr__, __dir__ = lazy_exports(__name__, {
+    "PARAMETERS": (".icdmm", "PARAMETERS"),
+    "batch_parameters": (".icdmm", "batch_parameters"),
+    "equilibrium": (".icdmm", "equilibrium"),
+    "run_model": (".icdmm", "run_model"),
+})
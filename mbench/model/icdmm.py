@@ -0,0 +1,356 @@
+# batched deterministic malaria transmission model following the structure of the imperial model (ICDMM),
+# Griffin et al. 2010 https://doi.org/10.1371/journal.pmed.1000324 and the ITN submodel of Walker et al. 2016
+#
+# simplified with respect to the R package: no latent period in humans, no maternal immunity, no biting
+# heterogeneity between individuals, no larval stages (mosquito emergence is held at its pre-intervention level), no
+# IRS and no seasonality, the parameters of these parts (dE, muEL, km, betaL, irs_cov, ...) are rejected
+#
+# every row of the parameter table is one model run, the state is held as arrays with the batch on the first axis,
+# humans (batch, 6, age) for S, T, D, A, U, P as proportions of the population, immunity (batch, 3, age) for IB, IC,
+# ID and mosquitoes (batch, 3) for Sv, Ev, Iv per human
+
+import numpy as np
+import pandas as pd
+
+from mbench.util.instrument import instrument
+
+# lower bounds of the age groups, in years
+AGE_GROUPS = (0, 0.25, 0.5, 0.75, 1, 1.25, 1.5, 1.75, 2, 3.5, 5, 7.5, 10, 15, 20, 30, 40, 50, 60, 70, 80)
+
+# default parameters, named as in ICDMM, rates per day
+PARAMETERS = {
+    "init_EIR": 10.,  # annual EIR at equilibrium, before interventions
+    "init_ft": 0.4,  # proportion of clinical cases treated
+    "eta": 1 / (21 * 365),  # death rate
+    "rho": 0.85,  # age dependent biting heterogeneity
+    "a0": 2920.,
+    "rA": 1 / 195.,  # recovery rates of asymptomatic, treated, diseased, sub-patent and prophylaxis
+    "rT": 0.2,
+    "rD": 0.2,
+    "rU": 1 / 110.,
+    "rP": 1 / 15.,
+    "delayMos": 10.,  # extrinsic incubation period
+    "delayGam": 12.5,  # lag from blood stage infection to infectiousness
+    "cD": 0.0676,  # infectiousness of diseased, treated and sub-patent humans
+    "cT": 0.322 * 0.0676,
+    "cU": 0.00062,
+    "gamma1": 1.82,
+    "b0": 0.59,  # probability of infection per infectious bite, and its blood stage immunity
+    "b1": 0.5,
+    "IB0": 43.9,
+    "kB": 2.16,
+    "uB": 7.2,
+    "dB": 3650.,
+    "phi0": 0.792,  # probability of clinical disease, and its clinical immunity
+    "phi1": 0.00074,
+    "IC0": 18.0,
+    "kC": 2.37,
+    "uCA": 6.06,
+    "dCA": 10950.,
+    "d1": 0.161,  # probability of detection by microscopy, and its detection immunity
+    "ID0": 1.58,
+    "kD": 0.477,
+    "uD": 9.45,
+    "dID": 3650.,
+    "fD0": 0.007,
+    "aD": 7993.5,
+    "gammaD": 4.82,
+    "mu0": 0.132,  # mosquito death rate without interventions
+    "Q0": 0.92,  # human blood index
+    "tau1": 0.69,  # feeding and resting durations of the gonotrophic cycle
+    "tau2": 2.31,
+    "bites_Bed": 0.89,  # proportion of bites taken in bed
+    "itn_cov": 0.,
+    "d_ITN0": 0.41,
+    "r_ITN0": 0.56,
+    "r_ITN1": 0.24,
+    "itn_half_life": 2.64 * 365,
+    "ITN_IRS_on": 200.,  # day the nets are deployed
+}
+
+# outputs recorded once per day
+OUTPUTS = ("prev", "inc", "eir")
+
+_S, _T, _D, _A, _U, _P = range(6)
+_IB, _IC, _ID = range(3)
+_SV, _EV, _IV = range(3)
+
+
+def batch_parameters(table=None, n: int = None, **overrides) -> dict:
+    """
+    one array per parameter, of shape (batch, 1) so that it broadcasts against the age axis
+    :param table: pandas DataFrame with one row per run, columns named as PARAMETERS
+    :param n: batch size when table is None, default to the length of the array overrides, or 1
+    :param overrides: parameters shared by all runs, or arrays of one value per run
+    :return: dict of parameter name to array
+    :raises ValueError: for a table column or an override that is not in PARAMETERS, it would have no effect
+    """
+    unknown = [name for name in overrides if name not in PARAMETERS]
+    if table is not None:
+        unknown += [name for name in table.columns if name not in PARAMETERS]
+    if unknown:
+        raise ValueError("{} are not parameters of the model, which has no latent period, larval stages, IRS or "
+                         "seasonality, see PARAMETERS".format(unknown))
+    # arrays of one value are shared by all runs like scalars
+    lengths = {name: np.size(value) for name, value in overrides.items() if np.size(value) > 1}
+    sizes = set(lengths.values()) | ({len(table)} if table is not None else set()) | ({n} if n else set())
+    if len(sizes) > 1:
+        raise ValueError("batch size differs between the table, n and the array overrides {}".format(lengths))
+    n = sizes.pop() if sizes else 1
+    parameters = {}
+    for name, default in PARAMETERS.items():
+        if name in overrides:
+            value = overrides[name]
+        elif table is not None and name in table:
+            value = table[name].to_numpy(dtype=float)
+        else:
+            value = default
+        parameters[name] = np.broadcast_to(np.asarray(value, dtype=float), (n,)).reshape(n, 1).copy()
+    return parameters
+
+
+class _Ages:
+    """
+    age structure shared by every run, aging rates, population proportions and biting heterogeneity
+    """
+
+    def __init__(self, eta, rho, a0, groups=AGE_GROUPS):
+        lower = np.asarray(groups, dtype=float) * 365
+        width = np.append(np.diff(lower), np.inf)
+        self.n = len(lower)
+        self.rate = np.where(np.isfinite(width), 1 / width, 0.)  # aging out of each group
+        den = np.empty(eta.shape[:1] + (self.n,))
+        den[:, 0] = (eta / (self.rate[0] + eta))[:, 0]
+        for i in range(1, self.n):
+            den[:, i] = self.rate[i - 1] * den[:, i - 1] / (self.rate[i] + eta[:, 0])
+        self.den = den / den.sum(axis=1, keepdims=True)
+        # per capita inflow by aging (births for the first group), moves immunity levels up the age groups
+        self.inflow = np.empty_like(self.den)
+        self.inflow[:, 0] = eta[:, 0] / self.den[:, 0]
+        self.inflow[:, 1:] = self.rate[:-1] * self.den[:, :-1] / self.den[:, 1:]
+        middle = lower + np.where(np.isfinite(width), width / 2, 5 * 365)
+        self.middle = middle
+        self.rel_foi = 1 - rho * np.exp(-middle / a0)
+        self.omega = (self.den * self.rel_foi).sum(axis=1, keepdims=True)
+        self.weight = self.rel_foi / self.omega  # EIR of each age group relative to the population mean
+        lower_years = lower / 365
+        self.prev_ages = (lower_years >= 2) & (lower_years < 10)
+
+
+def _immunity_functions(p, ages, immunity):
+    """
+    probabilities of infection per bite, of clinical disease and of detection, from the immunity levels
+    """
+    b = p["b0"] * (p["b1"] + (1 - p["b1"]) / (1 + (immunity[:, _IB] / p["IB0"]) ** p["kB"]))
+    phi = p["phi0"] * (p["phi1"] + (1 - p["phi1"]) / (1 + (immunity[:, _IC] / p["IC0"]) ** p["kC"]))
+    fd = 1 - (1 - p["fD0"]) / (1 + (ages.middle / p["aD"]) ** p["gammaD"])
+    detect = p["d1"] + (1 - p["d1"]) / (1 + fd * (immunity[:, _ID] / p["ID0"]) ** p["kD"])
+    return b, phi, detect
+
+
+def _infectiousness(p, ages, humans, detect):
+    """
+    mean infectiousness of a bitten human, per batch row
+    """
+    c_a = p["cU"] + (p["cD"] - p["cU"]) * detect ** p["gamma1"]
+    per_age = (p["cD"] * humans[:, _D] + p["cT"] * humans[:, _T] + c_a * humans[:, _A]
+               + p["cU"] * humans[:, _U])
+    return (ages.weight * per_age).sum(axis=1)
+
+
+def _itn(p, t):
+    """
+    mosquito death rate and human biting rate of each run at day t, ITN submodel of Walker et al. 2016
+    :return: mu, av_human
+    """
+    since = t - p["ITN_IRS_on"]
+    on = since >= 0
+    cov = np.where(on, p["itn_cov"], 0.)
+    decay = np.exp(-np.maximum(since, 0) * np.log(2) / p["itn_half_life"])
+    d_itn = p["d_ITN0"] * decay
+    r_itn = p["r_ITN1"] + (p["r_ITN0"] - p["r_ITN1"]) * decay
+    s_itn = 1 - d_itn - r_itn
+    yy = 1 - cov + cov * (1 - p["bites_Bed"] + p["bites_Bed"] * s_itn)  # successful feed on a random human
+    zbar = p["Q0"] * cov * p["bites_Bed"] * r_itn  # repelled
+    wbar = 1 - p["Q0"] + p["Q0"] * yy  # successful feed on any host
+    p1 = wbar * np.exp(-p["mu0"] * p["tau1"]) / (1 - zbar * np.exp(-p["mu0"] * p["tau1"]))
+    p2 = np.exp(-p["mu0"] * p["tau2"])
+    fv = 1 / (p["tau1"] / (1 - zbar) + p["tau2"])
+    mu = -fv * np.log(p1 * p2)
+    q = 1 - (1 - p["Q0"]) / wbar
+    return mu[:, 0], (fv * q * yy / wbar)[:, 0]
+
+
+def equilibrium(p: dict, ages: _Ages = None):
+    """
+    state of every run at equilibrium with its init_EIR and no interventions, solved age group by age group
+    :param p: batch_parameters
+    :return: humans (batch, 6, age), immunity (batch, 3, age), mosquitoes (batch, 3), emergence (batch,)
+    """
+    ages = _Ages(p["eta"], p["rho"], p["a0"]) if ages is None else ages
+    batch = p["eta"].shape[0]
+    eir = p["init_EIR"] / 365 * ages.weight  # (batch, age) per person per day
+    immunity = np.zeros((batch, 3, ages.n))
+    previous = np.zeros((batch, 3))
+    b = p["b0"] * np.ones_like(eir)
+    for i in range(ages.n):
+        x = ages.inflow[:, i]
+        boost_b = eir[:, i] / (eir[:, i] * p["uB"][:, 0] + 1)
+        immunity[:, _IB, i] = (boost_b + x * previous[:, _IB]) / (1 / p["dB"][:, 0] + x)
+        b[:, i] = p["b0"][:, 0] * (p["b1"][:, 0] + (1 - p["b1"][:, 0]) / (
+            1 + (immunity[:, _IB, i] / p["IB0"][:, 0]) ** p["kB"][:, 0]))
+        foi = b[:, i] * eir[:, i]
+        for k, rate, duration in ((_IC, "uCA", "dCA"), (_ID, "uD", "dID")):
+            boost = foi / (foi * p[rate][:, 0] + 1)
+            immunity[:, k, i] = (boost + x * previous[:, k]) / (1 / p[duration][:, 0] + x)
+        previous = immunity[:, :, i]
+    foi = b * eir
+    _, phi, detect = _immunity_functions(p, ages, immunity)
+
+    # linear system of the human compartments, one 6 x 6 solve per run and age group, fed by the group below
+    humans = np.zeros((batch, 6, ages.n))
+    inflow = np.zeros((batch, 6))
+    inflow[:, _S] = p["eta"][:, 0]
+    for i in range(ages.n):
+        matrix = _transitions(p, foi[:, i], phi[:, i])
+        matrix -= (ages.rate[i] + p["eta"][:, :, None]) * np.eye(6)
+        humans[:, :, i] = np.linalg.solve(matrix, -inflow[:, :, None])[:, :, 0]
+        inflow = ages.rate[i] * humans[:, :, i]
+
+    av0 = p["Q0"][:, 0] / (p["tau1"][:, 0] + p["tau2"][:, 0])
+    foi_v = av0 * _infectiousness(p, ages, humans, detect)
+    mu0, delay = p["mu0"][:, 0], p["delayMos"][:, 0]
+    survive = np.exp(-mu0 * delay)
+    mosquitoes = np.empty((batch, 3))
+    mosquitoes[:, _IV] = p["init_EIR"][:, 0] / 365 / av0
+    mosquitoes[:, _SV] = mosquitoes[:, _IV] * mu0 / (foi_v * survive)
+    mosquitoes[:, _EV] = foi_v * mosquitoes[:, _SV] * (1 - survive) / mu0
+    emergence = (foi_v + mu0) * mosquitoes[:, _SV]
+    return humans, immunity, mosquitoes, emergence
+
+
+def _transitions(p, foi, phi):
+    """
+    (batch, 6, 6) rate matrix of the human compartments within an age group, columns are the origin
+    """
+    ft = p["init_ft"][:, 0]
+    matrix = np.zeros(foi.shape + (6, 6))
+    for origin in (_S, _A, _U):
+        # infection, clinical cases are treated (T) or not (D), the others become or stay asymptomatic
+        matrix[:, _T, origin] += ft * phi * foi
+        matrix[:, _D, origin] += (1 - ft) * phi * foi
+        matrix[:, _A, origin] += (1 - phi) * foi
+    matrix[:, _A, _A] -= (1 - phi) * foi
+    for origin, destination, rate in ((_T, _P, "rT"), (_D, _A, "rD"), (_A, _U, "rA"), (_U, _S, "rU"),
+                                      (_P, _S, "rP")):
+        matrix[:, destination, origin] += p[rate][:, 0]
+    matrix[:, np.arange(6), np.arange(6)] -= matrix.sum(axis=1)
+    return matrix
+
+
+@instrument
+def run_model(table=None, time: int = 365 * 4, dt: float = 0.5, chunk_size: int = 2048, **overrides) -> dict:
+    """
+    integrate every run of the batch, forward Euler with a fixed step and ring buffers for the two delays
+    e.g. the 16 districts x 51 coverage ratios x 51 resistance levels of a sweep grid in one call
+        run_model(grid.rename(columns={"eir": "init_EIR", "d_itn": "d_ITN0", "r_itn": "r_ITN0"})[
+            ["init_EIR", "itn_cov", "d_ITN0", "r_ITN0"]])
+    :param table: parameter table, one row per run, columns named as PARAMETERS (missing ones take the defaults),
+    identifiers should be in the index
+    :param time: days to simulate
+    :param dt: step in days, 1 / dt must be an integer
+    :param chunk_size: runs integrated together, bounds the working set of the preallocated buffers
+    :param overrides: parameters shared by all runs, see batch_parameters
+    :return: dict of OUTPUTS to arrays (batch, time), slide prevalence in 2-10 year olds, clinical incidence per
+    person per day and annual EIR
+    """
+    p = batch_parameters(table, **overrides)
+    batch = p["eta"].shape[0]
+    outputs = {name: np.empty((batch, time)) for name in OUTPUTS}
+    for start in range(0, batch, chunk_size):
+        rows = slice(start, min(start + chunk_size, batch))
+        _integrate({name: value[rows] for name, value in p.items()}, time, dt,
+                   {name: value[rows] for name, value in outputs.items()})
+    if isinstance(table, pd.DataFrame):
+        return {name: pd.DataFrame(value, index=table.index) for name, value in outputs.items()}
+    return outputs
+
+
+def _integrate(p: dict, time: int, dt: float, outputs: dict):
+    ages = _Ages(p["eta"], p["rho"], p["a0"])
+    humans, immunity, mosquitoes, emergence = equilibrium(p, ages)
+    batch = humans.shape[0]
+    steps_per_day = int(round(1 / dt))
+    if not np.isclose(steps_per_day * dt, 1):
+        raise ValueError("1 / dt should be an integer, got dt={}".format(dt))
+
+    # ring buffers, the delays may differ between runs so each run reads its own lag
+    lag_mos = np.rint(p["delayMos"][:, 0] / dt).astype(int)
+    lag_gam = np.rint(p["delayGam"][:, 0] / dt).astype(int)
+    size = int(max(lag_mos.max(), lag_gam.max())) + 1
+    rows = np.arange(batch)
+    mu, av = _itn(p, np.zeros_like(p["eta"]) - np.inf)
+    _, phi, detect = _immunity_functions(p, ages, immunity)
+    infectious_history = np.repeat(_infectiousness(p, ages, humans, detect)[:, None], size, axis=1)
+    infection_history = np.repeat((av * infectious_history[:, 0] * mosquitoes[:, _SV])[:, None], size, axis=1)
+
+    d_humans = np.empty_like(humans)
+    d_immunity = np.empty_like(immunity)
+    d_mosquitoes = np.empty_like(mosquitoes)
+    flow = np.empty((batch, ages.n))
+    aging = np.empty_like(humans)
+    ft = p["init_ft"]
+    rates = {name: p[name] for name in ("rT", "rD", "rA", "rU", "rP")}
+    for step in range(time * steps_per_day):
+        t = step * dt
+        head = step % size
+        mu, av = _itn(p, np.full_like(p["eta"], t))
+        b, phi, detect = _immunity_functions(p, ages, immunity)
+        eir = av[:, None] * mosquitoes[:, _IV, None] * ages.weight
+        foi = b * eir
+        infectious_history[:, head] = _infectiousness(p, ages, humans, detect)
+        foi_v = av * infectious_history[rows, (head - lag_gam) % size]
+        infection_history[:, head] = foi_v * mosquitoes[:, _SV]
+
+        if step % steps_per_day == 0:
+            day = step // steps_per_day
+            slide = humans[:, _T] + humans[:, _D] + detect * humans[:, _A]
+            outputs["prev"][:, day] = (slide[:, ages.prev_ages].sum(axis=1)
+                                      / ages.den[:, ages.prev_ages].sum(axis=1))
+            np.multiply(phi * foi, humans[:, _S] + humans[:, _A] + humans[:, _U], out=flow)
+            outputs["inc"][:, day] = flow.sum(axis=1)
+            outputs["eir"][:, day] = (eir * ages.den).sum(axis=1) * 365
+
+        # humans, infection then recovery, aging and deaths
+        susceptible = humans[:, _S] + humans[:, _U]
+        np.multiply(phi * foi, susceptible + humans[:, _A], out=flow)
+        d_humans[:, _T] = ft * flow - rates["rT"] * humans[:, _T]
+        d_humans[:, _D] = (1 - ft) * flow - rates["rD"] * humans[:, _D]
+        d_humans[:, _A] = ((1 - phi) * foi * susceptible - phi * foi * humans[:, _A]
+                           + rates["rD"] * humans[:, _D] - rates["rA"] * humans[:, _A])
+        d_humans[:, _U] = rates["rA"] * humans[:, _A] - (foi + rates["rU"]) * humans[:, _U]
+        d_humans[:, _P] = rates["rT"] * humans[:, _T] - rates["rP"] * humans[:, _P]
+        d_humans[:, _S] = (rates["rP"] * humans[:, _P] + rates["rU"] * humans[:, _U]
+                           - foi * humans[:, _S])
+        np.multiply(humans, ages.rate, out=aging)
+        d_humans -= aging
+        d_humans[:, :, 1:] += aging[:, :, :-1]
+        d_humans -= p["eta"][:, :, None] * humans
+        d_humans[:, _S, 0] += p["eta"][:, 0]
+
+        # immunity, boosting, decay and the mixing of levels by aging
+        d_immunity[:, _IB] = eir / (eir * p["uB"] + 1) - immunity[:, _IB] / p["dB"]
+        d_immunity[:, _IC] = foi / (foi * p["uCA"] + 1) - immunity[:, _IC] / p["dCA"]
+        d_immunity[:, _ID] = foi / (foi * p["uD"] + 1) - immunity[:, _ID] / p["dID"]
+        d_immunity[:, :, 0] -= immunity[:, :, 0] * ages.inflow[:, None, 0]
+        d_immunity[:, :, 1:] -= (immunity[:, :, 1:] - immunity[:, :, :-1]) * ages.inflow[:, None, 1:]
+
+        # mosquitoes, infections of delayMos days ago become infectious if the mosquito survived
+        matured = infection_history[rows, (head - lag_mos) % size] * np.exp(-mu * p["delayMos"][:, 0])
+        d_mosquitoes[:, _SV] = emergence - foi_v * mosquitoes[:, _SV] - mu * mosquitoes[:, _SV]
+        d_mosquitoes[:, _EV] = infection_history[:, head] - matured - mu * mosquitoes[:, _EV]
+        d_mosquitoes[:, _IV] = matured - mu * mosquitoes[:, _IV]
+
+        humans += dt * d_humans
+        immunity += dt * d_immunity
+        mosquitoes += dt * d_mosquitoes
@@ -0,0 +1,6 @@
+from mbench._lazy import lazy_exports
+
+__getattr__, __dir__ = lazy_exports(__name__, {
+    "read_polygons": (".neighbours", "read_polygons"),
+    "neighbour_table": (".neighbours", "neighbour_table"),
+})
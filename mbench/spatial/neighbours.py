@@ -0,0 +1,195 @@
+# neighbour list of the districts of a shapefile, for missing_data, without comparing every pair of polygons:
+# a uniform grid over the bounding boxes gives the candidate pairs, and only those are checked for a shared boundary
+
+import hashlib
+import os
+
+import numpy as np
+import pandas as pd
+from scipy.spatial import cKDTree
+
+from mbench.util.cache import stable_hash
+
+
+def _file_hash(path: str) -> str:
+    sha1 = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            sha1.update(block)
+    return sha1.hexdigest()
+
+
+def read_polygons(path: str, name_field: str):
+    """
+    read the polygons of a shapefile once
+    :param path: shapefile path, with or without the .shp suffix
+    :param name_field: attribute holding the district name
+    :return: names (list), vertices (list of (n, 2) arrays, the parts of a polygon one after the other separated by
+    a row of nan), bounding boxes (array of xmin, ymin, xmax, ymax)
+    """
+    import shapefile  # pylint: disable=import-outside-toplevel
+
+    with shapefile.Reader(path) as reader:
+        fields = [field[0] for field in reader.fields[1:]]
+        column = fields.index(name_field)
+        names, vertices, boxes = [], [], []
+        for shape_record in reader.iterShapeRecords():
+            names.append(shape_record.record[column])
+            points = np.asarray(shape_record.shape.points, dtype=float).reshape(-1, 2)
+            vertices.append(np.insert(points, shape_record.shape.parts[1:], np.nan, axis=0))
+            boxes.append(shape_record.shape.bbox)
+    return names, vertices, np.asarray(boxes, dtype=float).reshape(-1, 4)
+
+
+def candidate_pairs(boxes: np.ndarray, tolerance: float = 0., cell_size: float = None) -> np.ndarray:
+    """
+    pairs of polygons whose bounding boxes overlap, found through a uniform grid index
+    :param boxes: (n, 4) xmin, ymin, xmax, ymax
+    :param tolerance: boxes are grown by this distance
+    :param cell_size: grid cell size, default to the median box extent
+    :return: (m, 2) array of polygon indices, i < j
+    """
+    boxes = boxes + np.array([-tolerance, -tolerance, tolerance, tolerance])
+    if cell_size is None:
+        extent = np.maximum(boxes[:, 2] - boxes[:, 0], boxes[:, 3] - boxes[:, 1])
+        cell_size = float(np.median(extent)) if len(boxes) else 1.
+    cell_size = cell_size or 1.
+    low = np.floor((boxes[:, :2] - boxes[:, :2].min(axis=0)) / cell_size).astype(np.int64)
+    high = np.floor((boxes[:, 2:] - boxes[:, :2].min(axis=0)) / cell_size).astype(np.int64)
+
+    # one (cell, polygon) entry per grid cell a box covers
+    polygons, cells = [], []
+    width = int(high[:, 0].max()) + 1 if len(boxes) else 1
+    for i, ((x0, y0), (x1, y1)) in enumerate(zip(low, high)):
+        x, y = np.meshgrid(np.arange(x0, x1 + 1), np.arange(y0, y1 + 1))
+        cells.append((y * width + x).ravel())
+        polygons.append(np.full(x.size, i))
+    entries = pd.DataFrame({
+        "cell": np.concatenate(cells) if cells else [],
+        "polygon": np.concatenate(polygons) if polygons else [],
+    })
+    pairs = entries.merge(entries, on="cell")
+    pairs = pairs.loc[pairs["polygon_x"] < pairs["polygon_y"], ["polygon_x", "polygon_y"]].drop_duplicates()
+    i, j = pairs.to_numpy().T
+    overlap = ((boxes[i, 0] <= boxes[j, 2]) & (boxes[j, 0] <= boxes[i, 2])
+               & (boxes[i, 1] <= boxes[j, 3]) & (boxes[j, 1] <= boxes[i, 3]))
+    return np.column_stack([i[overlap], j[overlap]])
+
+
+class _Edges:
+    """
+    vertices and edges of one polygon, with a KD tree of the edge midpoints: a point within tolerance of an edge is
+    within half the edge length plus tolerance of its midpoint
+    edges longer than the mean edge are split into pieces of at most that length, so that one long straight edge
+    (coastline, straight border) does not make every vertex a candidate of every edge, at most doubling the edges
+    """
+
+    def __init__(self, vertices: np.ndarray):
+        finite = np.isfinite(vertices).all(axis=1)
+        self.points = vertices[finite]
+        # no edge between the last vertex of a part and the first of the next
+        edges = finite[:-1] & finite[1:]
+        starts, ends = vertices[:-1][edges], vertices[1:][edges]
+        length = np.linalg.norm(ends - starts, axis=1)
+        bound = length.mean() if len(length) and length.mean() > 0 else 1.
+        pieces = np.maximum(np.ceil(length / bound), 1).astype(np.intp)
+        edge = np.repeat(np.arange(len(starts)), pieces)
+        # position of each piece along its edge, 0 to pieces - 1
+        piece = np.arange(len(edge)) - np.repeat(np.cumsum(pieces) - pieces, pieces)
+        direction = (ends - starts)[edge] / pieces[edge, None]
+        self.starts = starts[edge] + piece[:, None] * direction
+        self.ends = self.starts + direction
+        self.low = self.points.min(axis=0) if len(self.points) else np.zeros(2)
+        self.high = self.points.max(axis=0) if len(self.points) else np.zeros(2)
+        self.radius = np.linalg.norm(direction, axis=1).max() / 2 if len(edge) else 0.
+        self.tree = cKDTree((self.starts + self.ends) / 2) if len(self.starts) else None
+
+    def touching(self, points: np.ndarray, tolerance: float) -> np.ndarray:
+        """
+        the points lying within tolerance of an edge
+        """
+        points = points[((points >= self.low - tolerance) & (points <= self.high + tolerance)).all(axis=1)]
+        if self.tree is None or not len(points):
+            return points[:0]
+        candidates = self.tree.query_ball_point(points, self.radius + tolerance)
+        point = np.repeat(np.arange(len(points)), [len(edges) for edges in candidates])
+        edge = np.fromiter((k for edges in candidates for k in edges), dtype=np.intp, count=len(point))
+        start, direction = self.starts[edge], self.ends[edge] - self.starts[edge]
+        length = (direction * direction).sum(axis=1)
+        along = np.divide(((points[point] - start) * direction).sum(axis=1), length,
+                          out=np.zeros(len(edge)), where=length > 0)
+        distance = np.linalg.norm(points[point] - start - np.clip(along, 0, 1)[:, None] * direction, axis=1)
+        return points[np.unique(point[distance <= tolerance])]
+
+
+def shared_boundary(vertices: list, pairs: np.ndarray, tolerance: float = 1e-6, min_shared: int = 2) -> np.ndarray:
+    """
+    confirm candidate pairs, two polygons are neighbours if at least min_shared distinct vertices of either lie
+    within tolerance of an edge of the other, so edges shared without shared vertices (T junctions, different vertex
+    densities) are found, and polygons touching at a single corner are not neighbours with the default of 2
+    :param vertices: list of (n, 2) vertex arrays, parts separated by a row of nan, see read_polygons
+    :param pairs: (m, 2) candidate pairs
+    :param tolerance: distance under which a vertex is on an edge, in the units of the shapefile
+    :param min_shared: boundary vertices that must be shared
+    :return: boolean array, one value per pair
+    """
+    edges = {}
+    confirmed = np.zeros(len(pairs), dtype=bool)
+    for k, (i, j) in enumerate(pairs):
+        for polygon in (i, j):
+            if polygon not in edges:
+                edges[polygon] = _Edges(vertices[polygon])
+        on_j = edges[j].touching(edges[i].points, tolerance)
+        on_i = edges[i].touching(edges[j].points, tolerance)
+        if len(on_j) + len(on_i) < min_shared:
+            continue
+        # vertices of both polygons at the same point count once
+        unique_j = np.unique(on_j, axis=0)
+        if len(unique_j) and len(on_i):
+            distance, _ = cKDTree(unique_j).query(on_i, distance_upper_bound=tolerance)
+            on_i = on_i[~np.isfinite(distance)]
+        confirmed[k] = len(unique_j) + len(np.unique(on_i, axis=0)) >= min_shared
+    return confirmed
+
+
+def neighbour_table(
+        path: str,
+        name_field: str,
+        tolerance: float = 1e-6,
+        min_shared: int = 2,
+        cache_dir: str = None,
+) -> pd.DataFrame:
+    """
+    from / to neighbour list of the polygons of a shapefile, both directions, as expected by missing_data
+    e.g. neighbour_table(data_dir + "GHA/.../260_Districts_of_Ghana", "DISTRICT", cache_dir=data_dir + ".cache")
+    :param path: shapefile path, with or without the .shp suffix
+    :param name_field: attribute holding the district name
+    :param tolerance: see shared_boundary
+    :param min_shared: see shared_boundary
+    :param cache_dir: directory of computed tables, keyed by the content of the .shp and .dbf files and the options
+    :return: DataFrame with from and to columns
+    """
+    stem = path[:-4] if path.lower().endswith(".shp") else path
+    cached = None
+    if cache_dir is not None:
+        key = stable_hash(
+            "edges", _file_hash(stem + ".shp"), _file_hash(stem + ".dbf"), name_field, tolerance, min_shared
+        )
+        cached = os.path.join(cache_dir, "neighbours-{}.csv".format(key[:16]))
+        if os.path.exists(cached):
+            return pd.read_csv(cached)
+
+    names, vertices, boxes = read_polygons(stem, name_field)
+    pairs = candidate_pairs(boxes, tolerance)
+    pairs = pairs[shared_boundary(vertices, pairs, tolerance, min_shared)]
+    names = np.asarray(names, dtype=object)
+    table = pd.DataFrame({
+        "from": np.concatenate([names[pairs[:, 0]], names[pairs[:, 1]]]),
+        "to": np.concatenate([names[pairs[:, 1]], names[pairs[:, 0]]]),
+    }).sort_values(["from", "to"], ignore_index=True)
+
+    if cached is not None:
+        os.makedirs(cache_dir, exist_ok=True)
+        table.to_csv(cached + ".tmp", index=False)
+        os.replace(cached + ".tmp", cached)
+    return table
@@ -0,0 +1,8 @@
+from mbench._lazy import lazy_exports
+
+__getattr__, __dir__ = lazy_exports(__name__, {
+    "parameter_grid": (".grid", "parameter_grid"),
+    "ResultStore": (".store", "ResultStore"),
+    "LocalExecutor": (".engine", "LocalExecutor"),
+    "run_sweep": (".engine", "run_sweep"),
+})
@@ -0,0 +1,104 @@
+import concurrent.futures
+import hashlib
+
+import pandas as pd
+
+from mbench.util.cache import ResultCache, stable_hash
+from mbench.util.instrument import instrument
+from .grid import iter_chunks
+from .store import ResultStore
+
+
+class LocalExecutor(concurrent.futures.Executor):
+    """
+    executor running every task in the current process as it is submitted, for debugging and small sweeps
+    """
+
+    def submit(self, fn, /, *args, **kwargs):
+        future = concurrent.futures.Future()
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except Exception as exception:  # pylint: disable=broad-except
+            future.set_exception(exception)
+        return future
+
+
+def grid_hash(grid: pd.DataFrame) -> str:
+    """
+    stable content hash of a sweep grid
+    """
+    return hashlib.sha1(pd.util.hash_pandas_object(grid, index=False).to_numpy().tobytes()).hexdigest()
+
+
+@instrument
+def run_sweep(
+        grid: pd.DataFrame,
+        fn,
+        store: ResultStore,
+        chunk_size: int = 256,
+        executor: concurrent.futures.Executor = None,
+        retries: int = 2,
+        max_pending: int = None,
+        cache: ResultCache = None,
+):
+    """
+    evaluate fn over the grid chunk by chunk, stream the results into the store and resume where a previous run of
+    the same sweep stopped
+    :param grid: sweep points, see parameter_grid
+    :param fn: function of a grid chunk returning a pandas DataFrame, must be picklable for process pools
+    :param store: ResultStore receiving one part per chunk
+    :param chunk_size: points per task
+    :param executor: concurrent.futures executor, default to a ProcessPoolExecutor, LocalExecutor() to run in process
+    :param retries: times a failing chunk is resubmitted before giving up
+    :param max_pending: maximum tasks in flight, bounds the memory held by queued chunks, default to 4 per worker
+    :param cache: ResultCache shared between sweeps, chunks whose content and fn are unchanged are read from it
+    instead of recomputed, so a sweep over an edited grid only evaluates the chunks that changed
+    :return: dict with the ids of chunks computed, read from the cache, skipped because already stored, and failed
+    with their last error
+    """
+    store.check_manifest({"points": len(grid), "chunk_size": chunk_size, "grid": grid_hash(grid)})
+    done = store.completed()
+    chunks = dict(iter_chunks(grid, chunk_size))
+    pending = [chunk_id for chunk_id in chunks if chunk_id not in done]
+    report = {"computed": [], "cached": [], "skipped": sorted(done & set(chunks)), "failed": {}}
+    keys = {}
+    if cache is not None:
+        for chunk_id in pending:
+            keys[chunk_id] = stable_hash(fn, chunks[chunk_id].reset_index(drop=True))
+            result = cache.get(keys[chunk_id])
+            if result is not None:
+                store.append(chunk_id, result)
+                report["cached"].append(chunk_id)
+        pending = [chunk_id for chunk_id in pending if chunk_id not in report["cached"]]
+
+    own_executor = executor is None
+    executor = concurrent.futures.ProcessPoolExecutor() if own_executor else executor
+    if max_pending is None:
+        max_pending = 4 * (getattr(executor, "_max_workers", None) or 1)
+    attempts = dict.fromkeys(pending, 0)
+    running = {}
+    try:
+        while pending or running:
+            while pending and len(running) < max_pending:
+                chunk_id = pending.pop(0)
+                running[executor.submit(fn, chunks[chunk_id])] = chunk_id
+            finished, _ = concurrent.futures.wait(running, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in finished:
+                chunk_id = running.pop(future)
+                exception = future.exception()
+                if exception is None:
+                    store.append(chunk_id, future.result())
+                    if cache is not None:
+                        cache.put(keys[chunk_id], future.result())
+                    report["computed"].append(chunk_id)
+                elif attempts[chunk_id] < retries:
+                    attempts[chunk_id] += 1
+                    pending.append(chunk_id)
+                else:
+                    report["failed"][chunk_id] = repr(exception)
+    finally:
+        for future in running:
+            future.cancel()
+        if own_executor:
+            executor.shutdown()
+    return report
@@ -0,0 +1,47 @@
+import itertools
+
+import numpy as np
+import pandas as pd
+
+from mbench.intervention.efficacy import Converter
+
+
+def parameter_grid(df: pd.DataFrame, resistance, converter: Converter = None, **axes) -> pd.DataFrame:
+    """
+    full factorial sweep grid over the district table, vector resistance and any other axes, e.g.
+    parameter_grid(gha, resistance=np.linspace(0, 1, 51), coverage_ratio=np.arange(0, 101, 2))
+    net efficacy is computed once per resistance level with the vectorized converter and joined to every point
+    :param df: district parameter table, e.g. gha indexed by adm1
+    :param resistance: 1d array of vector resistance, 1 - bioassay mortality
+    :param converter: Converter or Converter_2022, default to Converter()
+    :param axes: other sweep axes, name to 1d array of values
+    :return: pandas DataFrame with one row per point, districts vary slowest, and a "point" column numbering them
+    """
+    converter = Converter() if converter is None else converter
+    resistance = np.asarray(resistance, dtype=float).ravel()
+    efficacy = converter.bioassay_to_rds_array(1 - resistance, as_frame=True)
+    efficacy.insert(0, "resistance", resistance)
+
+    districts = df.reset_index()
+    axes = {name: np.asarray(values).ravel() for name, values in axes.items()}
+    sizes = [len(districts), len(efficacy)] + [len(values) for values in axes.values()]
+    # index of every point along each axis, the last axis varies fastest
+    positions = np.indices(sizes).reshape(len(sizes), -1)
+
+    columns = [
+        districts.iloc[positions[0]].reset_index(drop=True),
+        efficacy.iloc[positions[1]].reset_index(drop=True),
+        pd.DataFrame({name: values[positions[i]] for i, (name, values) in enumerate(axes.items(), start=2)}),
+    ]
+    grid = pd.concat(columns, axis=1)
+    grid.insert(0, "point", np.arange(len(grid), dtype=np.int64))
+    return grid
+
+
+def iter_chunks(grid: pd.DataFrame, chunk_size: int):
+    """
+    split the grid into consecutive chunks
+    :return: generator of (chunk id, chunk)
+    """
+    for chunk_id, start in zip(itertools.count(), range(0, len(grid), chunk_size)):
+        yield chunk_id, grid.iloc[start:start + chunk_size]
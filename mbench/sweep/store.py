@@ -0,0 +1,72 @@
+import glob
+import importlib.util
+import json
+import os
+
+import pandas as pd
+
+
+class ResultStore:
+    """
+    append-only columnar store of sweep results, one file per completed chunk
+    parts are written to a temporary file then renamed, so a crash never leaves a partial part behind, and the parts
+    present on disk are the checkpoint of the sweep
+    """
+
+    def __init__(self, directory: str, fmt: str = None):
+        """
+        :param directory: store directory, created if needed
+        :param fmt: "parquet" or "csv", default to parquet when pyarrow is installed
+        """
+        if fmt is None:
+            fmt = "parquet" if importlib.util.find_spec("pyarrow") is not None else "csv"
+        if fmt not in ("parquet", "csv"):
+            raise ValueError("unknown store format {}".format(fmt))
+        self.directory = directory
+        self.format = fmt
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, chunk_id: int) -> str:
+        return os.path.join(self.directory, "part-{:08d}.{}".format(chunk_id, self.format))
+
+    def completed(self) -> set:
+        """
+        :return: ids of the chunks already stored
+        """
+        parts = glob.glob(os.path.join(self.directory, "part-*.{}".format(self.format)))
+        return {int(os.path.basename(part)[5:13]) for part in parts}
+
+    def append(self, chunk_id: int, result: pd.DataFrame):
+        """
+        store the result of one chunk
+        """
+        path = self._path(chunk_id)
+        temporary = "{}.{}.tmp".format(path, os.getpid())
+        if self.format == "parquet":
+            result.to_parquet(temporary, index=False)
+        else:
+            result.to_csv(temporary, index=False)
+        os.replace(temporary, path)
+
+    def read(self) -> pd.DataFrame:
+        """
+        :return: all stored results, in chunk order
+        """
+        read = pd.read_parquet if self.format == "parquet" else pd.read_csv
+        parts = [read(self._path(chunk_id)) for chunk_id in sorted(self.completed())]
+        return pd.concat(parts, ignore_index=True) if parts else pd.DataFrame()
+
+    def check_manifest(self, manifest: dict):
+        """
+        record the sweep definition on first use, and refuse to resume a store written by a different sweep
+        :param manifest: json serializable description of the sweep
+        """
+        path = os.path.join(self.directory, "sweep.json")
+        if os.path.exists(path):
+            with open(path) as f:
+                stored = json.load(f)
+            if stored != manifest:
+                raise ValueError("{} holds results of another sweep: {}".format(self.directory, stored))
+        else:
+            with open(path, "w") as f:
+                json.dump(manifest, f)
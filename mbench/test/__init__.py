@@ -1,5 +0,0 @@
-from lxml import etree
-
-from mbench.util.xml_import import load_xml_config
-
-root = load_xml_config("/Users/sepmein/dev/github/openmalaria/test/scenarioVecFullTest.xml")
\ No newline at end of file
@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+
+from mbench.demographic import Aggregator
+
+
+def _adm2(n=300, seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        "adm2": ["D{}".format(i) for i in range(n)],
+        "adm1": ["R{}".format(i) for i in rng.integers(0, 16, n)],
+        "population": rng.integers(1000, 100000, n).astype(float),
+        "irs_2018": rng.uniform(0, 1, n),
+        "irs_2019": rng.uniform(0, 1, n),
+    })
+    df.loc[[3, 7], "irs_2019"] = np.nan
+    return df
+
+
+def test_aggregate_matches_merge():
+    df = _adm2()
+    aggregator = Aggregator(df, source="adm2", target="adm1", weight="population")
+    values = df.set_index("adm2")[["irs_2018", "irs_2019", "population"]]
+    result = aggregator.aggregate(values[["irs_2018", "irs_2019"]])
+
+    for column in ("irs_2018", "irs_2019"):
+        known = df.dropna(subset=[column])
+        merged = known.assign(covered=known[column] * known["population"])
+        merged = merged.groupby("adm1")[["covered", "population"]].sum()
+        expected = merged["covered"] / merged["population"]
+        pd.testing.assert_series_equal(result[column].sort_index(), expected.sort_index(), check_names=False)
+
+    totals = Aggregator(df, "adm2", "adm1").aggregate(values["population"], how="sum")
+    pd.testing.assert_series_equal(
+        totals.sort_index(), df.groupby("adm1")["population"].sum().sort_index(), check_names=False)
+
+    back = aggregator.disaggregate(result)
+    expected = df[["adm2", "adm1"]].merge(result, left_on="adm1", right_index=True).set_index("adm2")
+    pd.testing.assert_frame_equal(back, expected[["irs_2018", "irs_2019"]].loc[back.index])
+    split = aggregator.disaggregate(totals, how="split")
+    np.testing.assert_allclose(split.to_numpy(), df["population"].to_numpy())
+
+
+def test_remap_split_districts():
+    # the 216 to 260 mapping, an old district split in two new ones and two old districts merged in one
+    mapping = pd.DataFrame({
+        "216": ["A", "A", "B", "C", "D"],
+        "260": ["A1", "A2", "B", "CD", "CD"],
+        "population": [100., 300., 50., 10., 30.],
+    })
+    aggregator = Aggregator(mapping, source="216", target="260", weight="population")
+    old = pd.DataFrame({"itn": [0.2, 0.4, 0.5, 0.9], "cases": [40., 5., 10., 20.]}, index=["A", "B", "C", "D"])
+    new = aggregator.aggregate(old[["itn"]])
+    np.testing.assert_allclose(new["itn"], [0.2, 0.2, 0.4, (0.5 * 10 + 0.9 * 30) / 40])
+    cases = aggregator.aggregate(old["cases"], how="sum")
+    np.testing.assert_allclose(cases, [10., 30., 5., 30.])
+
+
+def test_pixels_to_adm2():
+    rng = np.random.default_rng(1)
+    n = 200000
+    pixels = pd.DataFrame({"pixel": np.arange(n), "adm2": rng.integers(0, 260, n), "population": rng.random(n)})
+    aggregator = Aggregator(pixels, source="pixel", target="adm2", weight="population",
+                            target_index=np.arange(260))
+    years = rng.random((n, 10))
+    result = aggregator.aggregate(years)
+    expected = (pd.DataFrame(years * pixels[["population"]].to_numpy()).groupby(pixels["adm2"]).sum()
+                .div(pixels.groupby("adm2")["population"].sum(), axis=0))
+    np.testing.assert_allclose(result, expected.to_numpy())
@@ -0,0 +1,29 @@
+import json
+
+from mbench.benchmark import datasets
+from mbench.benchmark.__main__ import main
+from mbench.benchmark.suite import CASES, compare, run
+
+
+def test_datasets():
+    df = datasets.district_table(10)
+    neighbour = datasets.neighbour_table(10)
+    assert len(df) == 10 and df["eir"].isna().any()
+    assert neighbour.isin(df.index).all().all() and len(neighbour) == 2 * 13
+
+
+def test_run_and_compare(tmp_path):
+    report = run({"tiny": 4}, repeat=1, path=str(tmp_path / "run.json"))
+    assert {result["case"] for result in report["results"]} == set(CASES)
+    assert json.loads((tmp_path / "run.json").read_text()) == report
+    assert compare(report, report) == []
+    slower = json.loads(json.dumps(report))
+    slower["results"][0]["min"] *= 2
+    assert [name for name, *_ in compare(report, slower)] == [report["results"][0]["case"]]
+
+    argv = ["--scale", "adm1", "--case", "adm1_name", "--repeat", "1"]
+    assert main(argv + ["--out", str(tmp_path / "adm1.json")]) == 0
+    baseline = json.loads((tmp_path / "adm1.json").read_text())
+    baseline["results"][0]["min"] /= 100
+    (tmp_path / "baseline.json").write_text(json.dumps(baseline))
+    assert main(argv + ["--baseline", str(tmp_path / "baseline.json")]) == 1
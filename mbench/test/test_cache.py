@@ -0,0 +1,108 @@
+import concurrent.futures
+
+import numpy as np
+import pandas as pd
+
+from mbench.intervention.efficacy import Converter, Converter_2022
+from mbench.sweep import LocalExecutor, ResultStore, parameter_grid, run_sweep
+from mbench.util.cache import ResultCache, stable_hash
+
+_CALLS = []
+
+
+def _prevalence(chunk: pd.DataFrame) -> pd.DataFrame:
+    _CALLS.append(int(chunk["point"].iloc[0]))
+    return pd.DataFrame({"point": chunk["point"], "value": chunk["eir"] * chunk["d_itn"]})
+
+
+def _put(args):
+    directory, i = args
+    ResultCache(directory, max_bytes=1 << 20).put(stable_hash(i), np.full(100, i))
+    return i
+
+
+def test_stable_hash():
+    x = np.linspace(0, 1, 5)
+    assert stable_hash(x) == stable_hash(x.copy())
+    assert stable_hash(x) != stable_hash(x.astype(np.float32))
+    assert stable_hash(1) != stable_hash("1")
+    assert stable_hash({"a": 1, "b": 2}) == stable_hash({"b": 2, "a": 1})
+    assert stable_hash(Converter().bioassay_to_rds_array) == stable_hash(Converter().bioassay_to_rds_array)
+    for other in (Converter(species="funestus"), Converter(verbose=True), Converter_2022()):
+        assert stable_hash(other.bioassay_to_rds_array) != stable_hash(Converter().bioassay_to_rds_array)
+
+    sources = ["def scale(x, k=2):\n    return x * k\n", "def scale(x, k=3):\n    return x * k\n",
+               "def scale(x, k=2):\n    return x + k\n"]
+    functions = []
+    for source in sources:
+        namespace = {}
+        exec(source, namespace)  # pylint: disable=exec-used
+        functions.append(namespace["scale"])
+    assert len({stable_hash(fn) for fn in functions}) == 3
+    assert stable_hash(_scaler(2)) == stable_hash(_scaler(2)) != stable_hash(_scaler(3))
+
+
+def _scaler(k):
+    def scale(x):
+        return x * k
+    return scale
+
+
+def test_result_cache_disk_lru(tmp_path):
+    cache = ResultCache(str(tmp_path), max_items=2, max_bytes=4000)
+    mortality = np.linspace(0, 1, 11)
+    first = cache.call(Converter().bioassay_to_rds_array, mortality)
+    again = ResultCache(str(tmp_path)).call(Converter().bioassay_to_rds_array, mortality)
+    np.testing.assert_array_equal(first, again)
+    assert (cache.hits, cache.misses) == (0, 1)
+
+    for i in range(20):
+        cache.put(stable_hash(i), np.zeros(100))
+    assert len(cache._memory) == 2
+    assert sum(size for _, size, _ in cache._entries()) <= 4000
+    assert stable_hash(19) in cache and stable_hash(0) not in cache
+
+
+def test_result_cache_scans_only_to_evict(tmp_path, monkeypatch):
+    cache = ResultCache(str(tmp_path), max_bytes=10000)
+    scans = []
+    entries = cache._entries
+    monkeypatch.setattr(cache, "_entries", lambda: scans.append(1) or entries())
+    for i in range(5):
+        cache.put(stable_hash(i), np.zeros(100))
+        cache.put(stable_hash(i), np.ones(100))
+    assert len(scans) == 1
+    assert cache._disk_bytes == sum(size for _, size, _ in entries())
+    for i in range(5, 40):
+        cache.put(stable_hash(i), np.zeros(100))
+    assert 1 < len(scans) < 20  # one per eviction, not one per put
+    assert cache._disk_bytes == sum(size for _, size, _ in entries()) <= 10000
+
+
+def test_result_cache_process_pool(tmp_path):
+    with concurrent.futures.ProcessPoolExecutor(2) as executor:
+        assert sorted(executor.map(_put, [(str(tmp_path), i) for i in range(8)] * 2)) == sorted(list(range(8)) * 2)
+    cache = ResultCache(str(tmp_path))
+    for i in range(8):
+        np.testing.assert_array_equal(cache.get(stable_hash(i)), np.full(100, i))
+    assert not list(tmp_path.glob("*/*.tmp"))
+
+    # the bound holds over the files written by every process
+    bounded = ResultCache(str(tmp_path), max_bytes=4000)
+    bounded.put(stable_hash("last"), np.zeros(100))
+    assert sum(size for _, size, _ in bounded._entries()) <= 4000
+
+
+def test_run_sweep_recomputes_changed_chunks(tmp_path):
+    cache = ResultCache(str(tmp_path / "cache"))
+    gha = pd.DataFrame({"eir": [10., 20., 30.]}, index=pd.Index(["A", "B", "C"], name="adm1"))
+    grid = parameter_grid(gha, resistance=np.linspace(0, 1, 6))
+    run_sweep(grid, _prevalence, ResultStore(str(tmp_path / "a"), "csv"), 6, LocalExecutor(), cache=cache)
+    _CALLS.clear()
+    gha.loc["B", "eir"] = 25.
+    grid = parameter_grid(gha, resistance=np.linspace(0, 1, 6))
+    store = ResultStore(str(tmp_path / "b"), "csv")
+    report = run_sweep(grid, _prevalence, store, 6, LocalExecutor(), cache=cache)
+    assert report["computed"] == [1] and report["cached"] == [0, 2] and _CALLS == [6]
+    result = store.read().sort_values("point", ignore_index=True)
+    np.testing.assert_allclose(result["value"], grid["eir"] * grid["d_itn"])
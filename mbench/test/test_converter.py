@@ -0,0 +1,198 @@
+import copy
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from mbench.intervention.efficacy import Converter, Converter_2022, TabulatedConverter
+from mbench.intervention.efficacy.converter import RDS_FIELDS, VERBOSE_FIELDS, _plan
+from mbench.intervention.efficacy.uncertainty import rds_quantiles
+
+
+def test_bioassay_to_rds_array_matches_scalar():
+    converter = Converter()
+    mortality = np.linspace(0, 1, 21).reshape(3, 7)
+    result = converter.bioassay_to_rds_array(mortality)
+    assert result.shape == mortality.shape
+    for index, x in np.ndenumerate(mortality):
+        rds_regular, rds_pbo = converter.bioassay_to_rds(float(x))
+        np.testing.assert_allclose(
+            [result[index][name] for name in RDS_FIELDS],
+            rds_regular + rds_pbo,
+            rtol=1e-12
+        )
+
+
+def test_bioassay_to_rds_array_series():
+    converter = Converter(species='funestus', verbose=True)
+    mortality = pd.Series([0.2, 0.5, 0.9], index=['A', 'B', 'C'])
+    result = converter.bioassay_to_rds_array(mortality)
+    assert isinstance(result, pd.DataFrame)
+    assert list(result.index) == ['A', 'B', 'C']
+    assert result['l_itn'].between(0, 1).all()
+    np.testing.assert_allclose(result['d_pbo'].loc['B'], converter.bioassay_to_rds(0.5)[1][2])
+
+
+def test_converter_2022_matches_closed_form():
+    converter = Converter_2022()
+    mortality = np.linspace(0.01, 0.99, 50)
+    hut = converter.mortality_bioassay_to_hut_trail(mortality)
+    pbo = converter.mortality_hut_trail_from_pyrethroid_to_pbo(hut)
+    for x, l_itn, l_pbo in zip(mortality, hut, pbo):
+        expected_itn = 1 - 1 / (1 + ((1 - x) / converter.alpha1) ** (-1.0 * converter.alpha2))
+        expected_pbo = 1 / (1 + math.exp(-1 * (converter.beta1 + converter.beta2 * expected_itn)))
+        assert math.isclose(l_itn, expected_itn, rel_tol=1e-12)
+        assert math.isclose(l_pbo, expected_pbo, rel_tol=1e-12)
+        for l in (l_itn, l_pbo):
+            expected_m = converter.delta1 * math.exp(
+                converter.delta2 * (1 - math.exp((1 - l) * converter.delta3)) / converter.delta3)
+            expected_k = 1 - math.exp(
+                converter.theta1 * (1 - math.exp(converter.theta2 * (1 - l))) / converter.theta2)
+            assert math.isclose(converter.ratio_of_mosquitoes_entering_hut_to_without_net(l), expected_m,
+                                rel_tol=1e-12)
+            assert math.isclose(converter.proportion_of_mosquitoes_successfully_feed_upon_entering(l), expected_k,
+                                rel_tol=1e-12)
+
+    result = converter.bioassay_to_rds_array(mortality)
+    for x, row in zip(mortality, result):
+        rds_regular, rds_pbo = converter.bioassay_to_rds(x)
+        np.testing.assert_allclose(tuple(row), rds_regular + rds_pbo, rtol=1e-12)
+
+
+def test_converter_2022_endpoints_finite():
+    converter = Converter_2022()
+    result = converter.bioassay_to_rds_array(np.array([0., 1e-12, 1 - 1e-12, 1.]))
+    for name in RDS_FIELDS:
+        assert np.isfinite(result[name]).all()
+    assert converter.mortality_bioassay_to_hut_trail(1.) == 1.
+
+
+def test_evaluate_selected_outputs():
+    mortality = np.linspace(0, 1, 11)
+    for converter in (Converter(verbose=True), Converter_2022(verbose=True)):
+        full = converter.bioassay_to_rds_array(mortality)
+        result = converter.evaluate(mortality, ['d_pbo', 'r_itn'])
+        assert result._fields == ('d_pbo', 'r_itn')
+        np.testing.assert_array_equal(result.d_pbo, full['d_pbo'])
+        np.testing.assert_array_equal(result.r_itn, full['r_itn'])
+        assert type(converter.evaluate(0.5, ('d_pbo', 'r_itn'))) is type(result)
+        selected = converter.bioassay_to_rds_array(mortality, outputs=VERBOSE_FIELDS[:8])
+        assert selected.dtype.names == VERBOSE_FIELDS[:8]
+
+    # the pyrethroid net alone only needs the hut trial mortalities of the PBO branch, dying skips feeding and decay
+    steps = {name for name, _, _ in _plan(Converter, ('d_itn',))}
+    assert steps == {'l_itn', 'm_itn', 'k_itn', 'j_itn', 'j_itn_d', 'k_itn_d', 'l_itn_d', 'd_itn'}
+    steps = {name for name, _, _ in _plan(Converter_2022, ('d_pbo',))}
+    assert steps == {'l_itn', 'l_pbo', 'm_pbo', 'k_pbo', 'j_pbo', 'j_pbo_d', 'k_pbo_d', 'l_pbo_d', 'd_pbo'}
+    assert Converter_2022().evaluate(0.5, ('bioassay_pbo',)).bioassay_pbo is None
+    with pytest.raises(ValueError):
+        Converter().evaluate(mortality, ('d_net',))
+    with pytest.raises(ValueError):
+        Converter().evaluate(mortality, ('_hut',))
+
+
+class _FullyResistant(Converter):
+    def mortality_pyrethroid_to_mortality_hut(self, mortality_pyrethroid_bioassay):
+        return super().mortality_pyrethroid_to_mortality_hut(0 * mortality_pyrethroid_bioassay)
+
+
+def test_evaluate_uses_hut_mortality_hook():
+    mortality = np.linspace(0, 1, 5)
+    result = _FullyResistant().evaluate(mortality, ('d_itn', 'd_pbo'))
+    expected = Converter().evaluate(np.zeros(5), ('d_itn', 'd_pbo'))
+    np.testing.assert_array_equal(result.d_itn, expected.d_itn)
+    np.testing.assert_array_equal(result.d_pbo, expected.d_pbo)
+    assert '_hut' in {name for name, _, _ in _plan(_FullyResistant, ('d_itn',))}
+
+
+def test_tabulated_converter_within_tolerance():
+    for converter in (Converter(), Converter_2022()):
+        tabulated = TabulatedConverter(converter, tolerance=1e-5)
+        assert tabulated.table.dtype == np.float32
+        assert tabulated.max_error <= 1e-5
+        mortality = np.random.default_rng(0).random(10000)
+        mortality[:2] = [0., 1.]
+        approx = tabulated.bioassay_to_rds_array(mortality)
+        exact = converter.bioassay_to_rds_array(mortality)
+        for name in RDS_FIELDS:
+            np.testing.assert_allclose(approx[name], exact[name], atol=2e-5)
+        assert TabulatedConverter(type(converter)(), tolerance=1e-5).table is tabulated.table
+
+
+def test_rds_to_bioassay_round_trip():
+    for converter in (Converter(), Converter_2022()):
+        mortality = np.linspace(0, 1, 41)
+        for output in ('r_itn', 'd_itn', 'd_pbo'):
+            target = np.append(converter.bioassay_to_rds_array(mortality)[output], [2., np.nan])
+            for solver in (converter, TabulatedConverter(converter)):
+                solution, reachable = solver.rds_to_bioassay(target, output=output)
+                assert reachable[:-2].all() and not reachable[-2:].any()
+                assert np.isnan(solution[-2:]).all()
+                np.testing.assert_allclose(
+                    converter.bioassay_to_rds_array(solution[:-2])[output], target[:-2], atol=1e-9)
+
+
+def test_rds_quantiles_point_estimate_draws():
+    converter = Converter_2022()
+    mortality = np.linspace(0, 1, 11)
+    draws = pd.DataFrame({'alpha1': [converter.alpha1] * 3, 'mu_p': [converter.mu_p] * 3})
+    result = rds_quantiles(converter, draws, mortality, q=(0.1, 0.9), chunk_size=4)
+    expected = converter.bioassay_to_rds_array(mortality)
+    for name in RDS_FIELDS:
+        for q in (0.1, 0.9):
+            np.testing.assert_allclose(result[(name, q)].to_numpy(), expected[name], rtol=1e-12)
+
+
+def test_rds_quantiles_match_per_draw_loop():
+    rng = np.random.default_rng(1)
+    mortality = np.linspace(0, 1, 9)
+    q = (0.025, 0.5, 0.975)
+    for converter in (Converter(), Converter_2022()):
+        parameters = ['alpha1', 'beta1', 'delta2', 'theta1', 'mu_p', 'k_0']
+        centre = np.array([getattr(converter, name) for name in parameters])
+        draws = centre * rng.lognormal(0, 0.1, (200, len(parameters)))
+        result = rds_quantiles(converter, draws, mortality, q=q, parameters=parameters, chunk_size=4)
+
+        values = np.empty((len(draws), len(mortality), len(RDS_FIELDS)))
+        for i, draw in enumerate(draws):
+            drawn = copy.copy(converter)
+            for name, value in zip(parameters, draw):
+                setattr(drawn, name, value)
+            for j, x in enumerate(mortality):
+                rds_regular, rds_pbo = drawn.bioassay_to_rds(x)
+                values[i, j] = rds_regular + rds_pbo
+        for k, name in enumerate(RDS_FIELDS):
+            expected = np.quantile(values[:, :, k], q, axis=0).T
+            np.testing.assert_allclose(result[name].to_numpy(), expected, rtol=1e-10, atol=1e-14)
+        # the draws spread the outputs
+        assert (result[('d_itn', 0.975)] - result[('d_itn', 0.025)]).iloc[1:-1].gt(1e-3).all()
+
+
+def test_decay_curves(tmp_path):
+    converter = Converter()
+    mortality = np.linspace(0, 1, 7)
+    curves = converter.decay_curves(mortality, days=1000, net='pbo', chunk_size=3)
+    rds = converter.bioassay_to_rds_array(mortality)
+    np.testing.assert_allclose(curves[0, :, 0], rds['r_pbo'])
+    np.testing.assert_allclose(curves[1, :, 0], rds['d_pbo'])
+    gamma = converter.evaluate(mortality, ('gamma_pbo',)).gamma_pbo
+    for day in (1, 10, 30):
+        decay = np.exp(-gamma * day)
+        assert (decay > 0.02).all()
+        np.testing.assert_allclose(curves[0, :, day], (rds['r_pbo'] - converter.r_m) * decay + converter.r_m, rtol=1e-12)
+        np.testing.assert_allclose(curves[1, :, day], rds['d_pbo'] * decay, rtol=1e-12)
+    # gamma is a daily rate, late in the horizon only d is still distinguishable from its limit
+    np.testing.assert_allclose(curves[1, :, 900], rds['d_pbo'] * np.exp(-gamma * 900), rtol=1e-10)
+    np.testing.assert_allclose(curves[0, :, 900], converter.r_m, rtol=1e-6)
+    # r_pbo_decay is the same curve at half_life_itn days, not a whole day
+    np.testing.assert_allclose(
+        rds['r_pbo_decay'],
+        (rds['r_pbo'] - converter.r_m) * np.exp(-gamma * converter.half_life_itn) + converter.r_m,
+        rtol=1e-12
+    )
+    np.testing.assert_allclose(curves.sum(axis=0), 1.)
+
+    stored = converter.decay_curves(mortality, days=1000, net='pbo', dtype=np.float32, path=str(tmp_path / 'pbo.npy'))
+    np.testing.assert_allclose(np.load(str(tmp_path / 'pbo.npy')), curves, atol=1e-6)
+    assert stored.dtype == np.float32
@@ -0,0 +1,46 @@
+import math
+
+import numpy as np
+import pandas as pd
+
+from mbench.eir import fit_prevalence_by_eir, get_eir_by_prevalence, get_prevalence_by_eir
+
+
+def test_prevalence_by_eir_vectorized():
+    eir = np.array([0., -1., np.nan, 0.5, 10., 300.])
+    prevalence = get_prevalence_by_eir(eir)
+    assert np.isnan(prevalence[:3]).all()
+    for x, p in zip(eir[3:], prevalence[3:]):
+        assert math.isclose(p, (24.2 * math.log10(x) + 24.68) / 100)
+    assert get_prevalence_by_eir(10.) == (24.2 + 24.68) / 100
+    assert get_prevalence_by_eir(1e6, clip=True) == 1.
+
+    frame = pd.DataFrame({"a": [1., 0.], "b": [5., 50.]}, index=["x", "y"])
+    result = get_prevalence_by_eir(frame)
+    assert isinstance(result, pd.DataFrame) and np.isnan(result.loc["y", "a"])
+    pd.testing.assert_frame_equal(get_eir_by_prevalence(get_prevalence_by_eir(frame["b"])).to_frame(), frame[["b"]])
+
+
+def test_fit_prevalence_by_eir_groups():
+    rng = np.random.default_rng(0)
+    n = 4000
+    df = pd.DataFrame({"Country": rng.choice(["Ghana", "Mali"], n), "year": rng.choice([2015, 2016], n)})
+    slope = np.where(df["Country"] == "Ghana", 20., 30.)
+    df["eir"] = 10 ** rng.uniform(-1, 3, n)
+    df["prevalence"] = (slope * np.log10(df["eir"]) + 25 + rng.normal(0, 2, n)) / 100
+    df.loc[:5, "eir"] = 0.
+
+    result = fit_prevalence_by_eir(df, by=["Country", "year"], n_boot=200, seed=1)
+    assert len(result) == 4 and result["n"].sum() == n - 6
+    np.testing.assert_allclose(result["slope"], [20, 20, 30, 30], atol=0.5)
+    assert (result["slope_low"] < result["slope"]).all() and (result["slope"] < result["slope_high"]).all()
+    assert ((result["intercept_low"] < 25) & (25 < result["intercept_high"])).sum() >= 3
+
+    pooled = fit_prevalence_by_eir(df.loc[df["Country"] == "Ghana"], n_boot=0)
+    np.testing.assert_allclose(pooled.loc["all", ["slope", "intercept"]], np.polyfit(
+        np.log10(df.loc[6:].query("Country == 'Ghana'")["eir"]),
+        df.loc[6:].query("Country == 'Ghana'")["prevalence"] * 100, 1))
+
+    df.loc[6:9, "Country"] = None
+    missing = fit_prevalence_by_eir(df, by="Country", n_boot=10, seed=1)
+    assert list(missing.index) == ["Ghana", "Mali"] and missing["n"].sum() == n - 10
@@ -0,0 +1,90 @@
+import gzip
+
+import numpy as np
+import pandas as pd
+import pytest
+from lxml import etree
+
+from mbench.export import imperial
+from mbench.export.malariaone import export
+from mbench.intervention.efficacy import Converter
+from mbench.test.test_load_xml import SCENARIO
+
+TEMPLATE = SCENARIO.replace(
+    b'<interventions name="itn"><human/></interventions>',
+    b'<interventions name="itn"><human><deployment><timed>'
+    b'<deploy coverage="0.5" time="1"/><deploy coverage="0.5" time="73"/>'
+    b'</timed></deployment></human></interventions>'
+)
+
+
+def test_malariaone_export(tmp_path):
+    template = tmp_path / "template.xml"
+    template.write_bytes(TEMPLATE)
+    df = pd.DataFrame(
+        {"eir": [12.5, np.nan, 80.], "itn_cov": [0.1, 0.2, np.nan], "other": 1},
+        index=pd.Index(["ASHANTI", "VOLTA", "OTI"], name="adm1"),
+    )
+    for processes, compress in ((None, False), (2, True)):
+        paths = export(df, str(template), str(tmp_path / "out"), prefix="om_", processes=processes, compress=compress)
+        assert list(paths.index) == list(df.index)
+        roots = []
+        for path in paths:
+            opener = gzip.open if compress else open
+            with opener(path, "rb") as f:
+                roots.append(etree.parse(f))
+        assert [root.find("entomology").get("scaledAnnualEIR") for root in roots] == ["12.5", "10", "80.0"]
+        assert [root.xpath("//deploy/@coverage") for root in roots] == [["0.1"] * 2, ["0.2"] * 2, ["0.5"] * 2]
+        assert paths["OTI"].endswith("om_OTI.xml.gz" if compress else "om_OTI.xml")
+
+
+def test_malariaone_export_interventions(tmp_path):
+    template = tmp_path / "template.xml"
+    template.write_bytes(SCENARIO.replace(
+        b'<interventions name="itn"><human/></interventions>',
+        b'<interventions name="itn"><human>'
+        b'<component id="ITN"><GVI><anophelesParams mosquito="gambiae">'
+        b'<deterrency value="0"/><preprandialKillingEffect value="0"/><postprandialKillingEffect value="0"/>'
+        b'</anophelesParams></GVI></component>'
+        b'<deployment><component id="ITN"/><timed><deploy coverage="0.5" time="1"/></timed></deployment>'
+        b'<deployment><component id="IRS"/><timed><deploy coverage="0.3" time="1"/></timed></deployment>'
+        b'</human></interventions>'
+    ))
+    df = pd.DataFrame({"itn_cov": [0.1, 0.2, 0.3], "irs_cov": [0.7, 0.8, 0.9]}, index=["A", "B", "C"])
+    df = df.join(Converter().bioassay_to_rds_array(pd.Series([0.2, 0.5, 0.9], index=df.index)))
+    paths = export(df, str(template), str(tmp_path / "out"), processes=2, chunksize=1)
+    for name, path in paths.items():
+        root = etree.parse(path)
+        coverage = root.xpath("//deployment/timed/deploy/@coverage")
+        assert coverage == [str(df.loc[name, "itn_cov"]), str(df.loc[name, "irs_cov"])]
+        assert root.find(".//deterrency").get("value") == str(df.loc[name, "r_itn"])
+        assert root.find(".//preprandialKillingEffect").get("value") == str(df.loc[name, "d_itn"])
+        assert root.find(".//postprandialKillingEffect").get("value") == "0"
+
+
+def _gha():
+    return pd.DataFrame(
+        {"eir": [10., 20.], "itn_cov": [0.5, 0.6], "old_district_name": ["ASHANTI", "BRONG_AHAFO"]},
+        index=pd.Index(["ASHANTI", "BONO"], name="adm1"),
+    )
+
+
+def test_imperial_parameter_table(tmp_path):
+    resistance = np.linspace(0, 1, 5)
+    table = imperial.parameter_table(_gha(), resistance)
+    assert len(table) == 2 * 5 * 2
+    assert isinstance(table["adm1"].dtype, pd.CategoricalDtype)
+    expected = Converter().bioassay_to_rds_array(1 - resistance)
+    bono_pbo = table[(table["adm1"] == "BONO") & (table["net_type"] == "pbo")]
+    np.testing.assert_allclose(bono_pbo["d"], expected["d_pbo"])
+
+    path = imperial.export(table, str(tmp_path / "gha.csv"), chunksize=7)
+    pd.testing.assert_frame_equal(pd.read_csv(path)[["r", "d"]], table[["r", "d"]])
+
+
+def test_imperial_columnar_export(tmp_path):
+    pytest.importorskip("pyarrow")
+    table = imperial.parameter_table(_gha(), np.linspace(0, 1, 5))
+    for name, read in (("gha.parquet", pd.read_parquet), ("gha.feather", pd.read_feather)):
+        result = read(imperial.export(table, str(tmp_path / name)))
+        pd.testing.assert_frame_equal(result, table)
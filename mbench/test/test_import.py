@@ -0,0 +1,42 @@
+import json
+import subprocess
+import sys
+
+import mbench
+
+_HEAVY = ("pandas", "scipy", "lxml")
+
+
+def _loaded_after(statement: str) -> dict:
+    """
+    import in a fresh interpreter, as a process pool worker would, and report the heavy modules and the time taken
+    """
+    code = (
+        "import json, sys, time\n"
+        "start = time.perf_counter()\n"
+        "{}\n"
+        "print(json.dumps({{'seconds': time.perf_counter() - start, "
+        "'loaded': [name for name in {!r} if name in sys.modules]}}))"
+    ).format(statement, _HEAVY + ("numpy",))
+    return json.loads(subprocess.run([sys.executable, "-c", code], check=True, capture_output=True).stdout)
+
+
+def test_import_is_lazy():
+    for statement in ("import mbench", "import mbench.eir"):
+        assert _loaded_after(statement)["loaded"] == []
+    assert _loaded_after("import mbench.demographic, mbench.util, mbench.sweep")["loaded"] == ["numpy"]
+    assert _loaded_after("from mbench.eir import get_prevalence_by_eir")["loaded"] == ["numpy"]
+    assert _loaded_after("import mbench.eir")["seconds"] < 0.1
+
+
+def test_lazy_attributes():
+    assert callable(mbench.demographic.adm1_name)
+    assert mbench.intervention.Converter is mbench.intervention.efficacy.Converter
+    assert "missing_data_interpolate" in dir(mbench.util)
+    assert callable(mbench.util.np_looper)
+    try:
+        mbench.util.missing
+    except AttributeError as error:
+        assert "missing" in str(error)
+    else:
+        raise AssertionError("missing attribute resolved")
@@ -0,0 +1,54 @@
+import concurrent.futures
+import json
+
+import numpy as np
+import pandas as pd
+
+from mbench.demographic import adm1_name
+from mbench.intervention.efficacy import Converter
+from mbench.util import instrument
+
+
+def _convert(n):
+    return len(Converter().bioassay_to_rds_array(np.linspace(0, 1, n)))
+
+
+def test_instrument_in_process(tmp_path):
+    instrument.reset()
+    adm1_name(pd.DataFrame({"adm1": ["Volta", "Oti"]}))
+    assert instrument.snapshot()["functions"] == {}
+
+    instrument.enable(trace=True, memory=True)
+    try:
+        adm1_name(pd.DataFrame({"adm1": ["Volta", "Oti", "Bono East"]}))
+        Converter().bioassay_to_rds_array(np.linspace(0, 1, 1000))
+    finally:
+        instrument.disable()
+    functions = instrument.snapshot()["functions"]
+    adm1 = functions["mbench.demographic.reformat.adm1_name"]
+    normalize = functions["mbench.demographic.reformat.normalize_names"]
+    assert adm1["calls"] == 1 and adm1["items"] == 3 and normalize["calls"] == 1
+    assert adm1["seconds"] >= normalize["seconds"] and adm1["peak_bytes"] >= normalize["peak_bytes"] > 0
+    rds = functions["mbench.intervention.efficacy.converter.Converter.bioassay_to_rds_array"]
+    assert rds["items"] == 1000 and rds["peak_bytes"] > 8 * 1000
+
+    trace = json.loads(open(instrument.export(str(tmp_path / "run.trace.json"))).read())
+    assert {event["name"] for event in trace["traceEvents"]} == set(functions)
+    summary = json.loads(open(instrument.export(str(tmp_path / "run.json"))).read())["summary"]
+    assert summary[0]["seconds"] == max(row["seconds"] for row in summary)
+    instrument.reset()
+
+
+def _enable(directory):
+    instrument.enable(directory=directory)
+
+
+def test_instrument_process_pool(tmp_path):
+    directory = str(tmp_path / "metrics")
+    with concurrent.futures.ProcessPoolExecutor(2, initializer=_enable, initargs=(directory,)) as executor:
+        assert list(executor.map(_convert, [10, 20, 30, 40])) == [10, 20, 30, 40]
+    merged = instrument.merge_directory(directory)
+    rds = merged["functions"]["mbench.intervention.efficacy.converter.Converter.bioassay_to_rds_array"]
+    assert rds["calls"] == 4 and rds["items"] == 100
+    assert instrument.merge([merged, merged])["functions"][
+        "mbench.intervention.efficacy.converter.Converter.bioassay_to_rds_array"]["calls"] == 8
@@ -0,0 +1,71 @@
+import numpy as np
+import pandas as pd
+
+from mbench.util.interpolate import missing_data, missing_data_batch
+
+
+def _ring(n: int):
+    index = pd.Index(["D{}".format(i) for i in range(n)])
+    pairs = [(index[i], index[(i + step) % n]) for i in range(n) for step in (1, 5)]
+    pairs += [(b, a) for a, b in pairs]
+    return index, pd.DataFrame(pairs, columns=["from", "to"])
+
+
+def _reference(df, neighbour, column, round_n):
+    missing = df[column].isna()
+    values = df[column].copy()
+    for _ in range(round_n):
+        previous = values.copy()
+        for name in values.index[missing]:
+            values[name] = previous[neighbour.loc[neighbour["from"] == name, "to"]].mean()
+    return values
+
+
+def test_missing_data_matches_neighbour_mean():
+    index, neighbour = _ring(30)
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({"eir": rng.random(30), "itn_cov": rng.random(30)}, index=index)
+    df.loc[index[rng.choice(30, 10, replace=False)], "eir"] = np.nan
+    df.loc[index[:4], "itn_cov"] = np.nan
+    original = df.copy()
+
+    for round_n in (1, 4):
+        result = missing_data(df, neighbour, ["eir", "itn_cov"], round_n)
+        for column in ("eir", "itn_cov"):
+            pd.testing.assert_series_equal(result[column], _reference(df, neighbour, column, round_n))
+    pd.testing.assert_frame_equal(df, original)
+
+    converged = missing_data(df, neighbour, "eir", 500)
+    solved = missing_data(df, neighbour, "eir", 0, method="harmonic")
+    np.testing.assert_allclose(solved["eir"], converged["eir"])
+
+
+def test_missing_data_batch_converges():
+    index, neighbour = _ring(30)
+    rng = np.random.default_rng(1)
+    scenarios = []
+    for _ in range(3):
+        df = pd.DataFrame({"eir": rng.random(30), "itn_cov": rng.random(30), "irs_cov": rng.random(30)}, index=index)
+        df.loc[index[rng.choice(30, 8, replace=False)], ["eir", "itn_cov"]] = np.nan
+        scenarios.append(df)
+    originals = [df.copy() for df in scenarios]
+
+    results, report = missing_data_batch(scenarios, neighbour, ["eir", "itn_cov", "irs_cov"], round_n=1000, tol=1e-10)
+    for df, original, result in zip(scenarios, originals, results):
+        pd.testing.assert_frame_equal(df, original)
+        expected = missing_data(df, neighbour, ["eir", "itn_cov"], 0, method="harmonic")
+        np.testing.assert_allclose(result[["eir", "itn_cov"]], expected[["eir", "itn_cov"]], atol=1e-8)
+    assert (report.loc[(slice(None), "irs_cov"), "rounds"] == 0).all()
+    assert (report["rounds"] < 1000).all()
+    assert (report["residual"] < 1e-10).all()
+
+
+def test_missing_data_non_string_labels():
+    index, neighbour = _ring(10)
+    df = pd.DataFrame({2020: np.arange(10.), 2021: np.arange(10.) * 2}, index=index)
+    df.loc[index[3], [2020, 2021]] = np.nan
+    result = missing_data(df, neighbour, 2020, 1)
+    assert result.loc[index[3], 2020] == _reference(df, neighbour, 2020, 1)[index[3]]
+    assert np.isnan(result.loc[index[3], 2021])
+    results, _ = missing_data_batch(df, neighbour, 2021, round_n=1)
+    assert results.loc[index[3], 2021] == 2 * result.loc[index[3], 2020]
@@ -0,0 +1,42 @@
+import os
+
+from mbench.util import xml_import
+from mbench.util.xml_import import load_xml_config, load_xml_sections
+
+SCENARIO = b"""<?xml version="1.0" encoding="UTF-8"?>
+<om:scenario xmlns:om="http://openmalaria.org/schema/scenario_44" name="test" schemaVersion="44">
+  <demography maximumAgeYrs="90" name="Ghana" popSize="1000"/>
+  <monitoring name="survey"><surveys><surveyTime>1</surveyTime></surveys></monitoring>
+  <interventions name="itn"><human/></interventions>
+  <healthSystem><ImmediateOutcomes name="test"/></healthSystem>
+  <entomology mode="dynamic" name="gambiae" scaledAnnualEIR="10"><vector/></entomology>
+  <model><parameters interval="5"/></model>
+</om:scenario>
+"""
+
+
+def test_load_xml_config_cache(tmp_path):
+    path = tmp_path / "scenario.xml"
+    path.write_bytes(SCENARIO)
+    xml_import.clear_cache()
+
+    root = load_xml_config(str(path))
+    root.find("entomology").set("scaledAnnualEIR", "20")
+    assert load_xml_config(str(path)).find("entomology").get("scaledAnnualEIR") == "10"
+
+    # same content with a new mtime reuses the tree, new content is parsed again
+    os.utime(str(path), ns=(1, 1))
+    assert load_xml_config(str(path)).find("demography").get("popSize") == "1000"
+    path.write_bytes(SCENARIO.replace(b'popSize="1000"', b'popSize="2000"'))
+    assert load_xml_config(str(path)).find("demography").get("popSize") == "2000"
+    assert load_xml_config(str(path), cache=False).find("demography").get("popSize") == "2000"
+
+
+def test_load_xml_sections(tmp_path):
+    path = tmp_path / "scenario.xml"
+    path.write_bytes(SCENARIO)
+    sections = load_xml_sections(str(path))
+    assert sorted(sections) == ["demography", "entomology", "interventions"]
+    assert sections["entomology"].get("scaledAnnualEIR") == "10"
+    assert sections["entomology"].find("vector") is not None
+    assert list(load_xml_sections(str(path), sections=("model", "missing"), cache=False)) == ["model"]
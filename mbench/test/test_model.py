@@ -0,0 +1,79 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from mbench.model import batch_parameters, equilibrium, run_model
+from mbench.model.icdmm import _Ages, _immunity_functions
+
+
+def test_equilibrium_is_stationary():
+    table = pd.DataFrame({"init_EIR": [0.5, 5., 50., 500.]}, index=list("ABCD"))
+    humans, _, _, _ = equilibrium(batch_parameters(table))
+    np.testing.assert_allclose(humans.sum(axis=(1, 2)), 1.)
+    assert (humans >= 0).all()
+    result = run_model(table, time=60, itn_cov=0.)
+    assert list(result["prev"].index) == list("ABCD")
+    np.testing.assert_allclose(result["eir"].to_numpy(), np.repeat(table[["init_EIR"]].to_numpy(), 60, axis=1))
+    prevalence = result["prev"].to_numpy()
+    np.testing.assert_allclose(prevalence, np.broadcast_to(prevalence[:, :1], prevalence.shape), rtol=1e-8)
+    assert result["prev"][0].is_monotonic_increasing
+
+
+def test_batch_matches_single_runs():
+    table = pd.DataFrame({
+        "init_EIR": np.repeat([5., 50.], 3),
+        "itn_cov": np.tile([0., 0.4, 0.8], 2),
+        "d_ITN0": 0.3,
+        "ITN_IRS_on": 10,
+    })
+    batch = run_model(table, time=120, chunk_size=4)
+    for i in range(len(table)):
+        single = run_model(table.iloc[[i]], time=120)
+        for name in ("prev", "inc", "eir"):
+            np.testing.assert_allclose(batch[name].iloc[i], single[name].iloc[0], rtol=1e-12)
+    final = batch["prev"][119].to_numpy().reshape(2, 3)
+    assert (np.diff(final, axis=1) < 0).all()
+    np.testing.assert_allclose(batch["prev"][5], batch["prev"][0])
+
+
+def test_batch_size_from_array_overrides():
+    result = run_model(time=10, init_EIR=np.array([5., 50., 500.]), itn_cov=[0.2])
+    assert result["prev"].shape == (3, 10)
+    assert batch_parameters(n=3)["init_EIR"].shape == (3, 1)
+    with pytest.raises(ValueError):
+        batch_parameters(init_EIR=[5., 50., 500.], itn_cov=[0., 0.5])
+    with pytest.raises(ValueError):
+        batch_parameters(pd.DataFrame({"init_EIR": [5., 50.]}), itn_cov=[0., 0.5, 0.8])
+
+
+def test_unused_parameters_raise():
+    with pytest.raises(ValueError, match="dE"):
+        run_model(time=10, dE=1.)
+    with pytest.raises(ValueError, match="irs_cov"):
+        batch_parameters(pd.DataFrame({"init_EIR": [5., 50.], "irs_cov": [0., 0.9]}))
+
+
+def test_equilibrium_matches_icdmm_recursion():
+    # closed form of the human compartments age group by age group, as in equilibrium_init_create of ICDMM
+    p = batch_parameters(init_EIR=np.array([1., 10., 100.]))
+    ages = _Ages(p["eta"], p["rho"], p["a0"])
+    humans, immunity, _, _ = equilibrium(p, ages)
+    b, phi, _ = _immunity_functions(p, ages, immunity)
+    foi = b * p["init_EIR"] / 365 * ages.weight
+    p = {name: value[:, 0] for name, value in p.items()}
+    inflow = np.zeros((3, 6))
+    for i in range(ages.n):
+        leave = ages.rate[i] + p["eta"]
+        a_t = p["init_ft"] * phi[:, i] * foi[:, i] / (p["rT"] + leave)
+        b_t = inflow[:, 1] / (p["rT"] + leave)
+        a_p = p["rT"] * a_t / (p["rP"] + leave)
+        b_p = (p["rT"] * b_t + inflow[:, 5]) / (p["rP"] + leave)
+        a_d = (1 - p["init_ft"]) * phi[:, i] * foi[:, i] / (p["rD"] + leave)
+        b_d = inflow[:, 2] / (p["rD"] + leave)
+        y = (ages.den[:, i] - b_t - b_d - b_p) / (1 + a_t + a_d + a_p)
+        t, d, pp = a_t * y + b_t, a_d * y + b_d, a_p * y + b_p
+        a = ((1 - phi[:, i]) * foi[:, i] * y + p["rD"] * d + inflow[:, 3]) / (foi[:, i] + p["rA"] + leave)
+        u = (p["rA"] * a + inflow[:, 4]) / (foi[:, i] + p["rU"] + leave)
+        expected = np.stack([y - a - u, t, d, a, u, pp], axis=1)
+        np.testing.assert_allclose(humans[:, :, i], expected, rtol=1e-8, atol=1e-14)
+        inflow = ages.rate[i] * expected
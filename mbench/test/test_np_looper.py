@@ -0,0 +1,34 @@
+import math
+
+import numpy as np
+import pandas as pd
+
+from mbench.eir import get_prevalence_by_eir
+from mbench.intervention.efficacy import Converter_2022
+from mbench.util.np_looper import is_numpy_native, np_looper
+
+
+def _scalar_only(x):
+    return math.log10(x) if x > 0 else float("nan")
+
+
+def test_np_looper_dispatch():
+    converter = Converter_2022()
+    assert is_numpy_native(converter.mortality_bioassay_to_hut_trail) and is_numpy_native(get_prevalence_by_eir)
+    assert not is_numpy_native(converter.bioassay_to_rds)
+    x = np.linspace(0, 1, 12).reshape(3, 4)
+    np.testing.assert_allclose(np_looper(converter.mortality_bioassay_to_hut_trail, x),
+                               converter.mortality_bioassay_to_hut_trail(x))
+
+    expected = np.log10(np.where(x > 0, x, np.nan))
+    out = np.empty((4, 3), dtype=np.float32).T
+    assert np_looper(_scalar_only, x, out=out, chunk_size=5) is out
+    np.testing.assert_allclose(out, expected, rtol=1e-6)
+    np.testing.assert_allclose(np_looper(_scalar_only, x, processes=2, chunk_size=5), expected)
+
+    series = pd.Series([1., 10.], index=["A", "B"], name="eir")
+    result = np_looper(_scalar_only, series)
+    pd.testing.assert_series_equal(result, pd.Series([0., 1.], index=["A", "B"], name="eir"))
+    assert np_looper(_scalar_only, 100.) == 2.
+    rds = np_looper(converter.bioassay_to_rds, x, dtype=object)
+    assert rds.shape == x.shape and rds[1, 1] == converter.bioassay_to_rds(x[1, 1])
@@ -0,0 +1,39 @@
+import numpy as np
+import pandas as pd
+
+from mbench.demographic import DistrictIndex, NameMatcher, adm1_name
+
+
+def test_adm1_name():
+    df = pd.DataFrame({"region": ["Greater Accra", "brong-ahafo", "Greater Accra"], "mean_age": [1, 2, 3]})
+    result = adm1_name(df, original_column_name="region")
+    assert list(result.index) == ["GREATER_ACCRA", "BRONG_AHAFO", "GREATER_ACCRA"]
+    assert "region" in df.columns
+
+    series = adm1_name(pd.Series([1, 2], index=["Upper West", "north-east"]), new_column_name="llins")
+    assert list(series.index) == ["UPPER_WEST", "NORTH_EAST"]
+    assert series.name == "llins"
+
+
+def test_district_index():
+    index = DistrictIndex(
+        ["Greater Accra", "Bono", "Bono East"],
+        previous_names=["Greater Accra", "Brong Ahafo", "Brong-Ahafo"],
+    )
+    index.add_aliases(["Accra"], ["GREATER_ACCRA"])
+    codes = index.encode(["greater accra", "Accra", "BONO-EAST", "Ashanti", np.nan])
+    assert list(codes) == [0, 0, 2, -1, -1]
+    assert list(index.decode(codes[:3])) == ["GREATER_ACCRA", "GREATER_ACCRA", "BONO_EAST"]
+    assert list(index.previous.decode(index.to_previous([1, 2]))) == ["BRONG_AHAFO", "BRONG_AHAFO"]
+    assert "bono" in index and "Ashanti" not in index
+
+
+def test_name_matcher():
+    index = DistrictIndex(["Greater Accra", "Brong Ahafo", "Upper West", "Upper East", "Ashanti"])
+    result = NameMatcher(index).match(pd.Series(["greater-accra", "Brong-Afaho", "UpperWest", "zzz"]))
+    assert list(result["match"].iloc[:3]) == ["GREATER_ACCRA", "BRONG_AHAFO", "UPPER_WEST"]
+    assert list(result["code"]) == [0, 1, 2, -1]
+    assert list(result["exact"]) == [True, False, False, False]
+    assert list(result["review"]) == [False, True, False, True]
+    report = NameMatcher.report(result)
+    assert list(report["raw"]) == ["zzz", "Brong-Afaho", "UpperWest"]
@@ -0,0 +1,37 @@
+import os
+
+import pandas as pd
+
+from mbench.util.sources import SourceRegistry
+
+_READS = []
+
+
+def _counting_reader(path, **kwargs):
+    _READS.append(path)
+    return pd.read_csv(path, **kwargs)
+
+
+def test_source_registry_cache(tmp_path):
+    pd.DataFrame({"adm1": ["A", "B"], "pop": [1, 2]}).to_csv(tmp_path / "pop.csv", index=False)
+    pd.DataFrame({"adm1": ["A", 1], "eir": [1.5, 2.5]}).to_csv(tmp_path / "eir.csv", index=False)
+    sources = SourceRegistry(str(tmp_path), cache_dir=str(tmp_path / "cache"))
+    sources.register("pop", "pop.csv", reader=_counting_reader, index_col="adm1")
+    sources.register("eir", "eir.csv", reader=_counting_reader)
+    sources.register("pop-2020", "pop.csv")
+
+    first = sources.load_all()
+    assert len(_READS) == 2 and list(first["pop"].index) == ["A", "B"]
+    again = sources.load_all()
+    assert len(_READS) == 2
+    for name in ("pop", "eir"):
+        pd.testing.assert_frame_equal(again[name], first[name])
+
+    pd.DataFrame({"adm1": ["A", "B"], "pop": [3, 4]}).to_csv(tmp_path / "pop.csv", index=False)
+    os.utime(tmp_path / "pop.csv", ns=(0, 0))
+    assert list(sources.load("pop")["pop"]) == [3, 4] and len(_READS) == 3
+    assert len(list((tmp_path / "cache").glob("pop-*"))) == 2
+    # the stale table of pop is removed, not the table of pop-2020
+    assert len(list((tmp_path / "cache").glob("pop-2020-*"))) == 1
+    sources.clear("pop")
+    assert len(list((tmp_path / "cache").glob("pop-*"))) == 1
@@ -0,0 +1,92 @@
+import numpy as np
+import pytest
+
+from mbench.spatial import neighbour_table
+from mbench.spatial.neighbours import _Edges, candidate_pairs, shared_boundary
+
+shapefile = pytest.importorskip("shapefile")
+
+
+def _square(x, y, size=1.):
+    return [[(x, y), (x, y + size), (x + size, y + size), (x + size, y), (x, y)]]
+
+
+def _write_grid(path):
+    with shapefile.Writer(path, shapeType=shapefile.POLYGON) as writer:
+        writer.field("NAME", "C")
+        for row in range(3):
+            for column in range(3):
+                writer.poly(_square(column, row))
+                writer.record("D{}{}".format(row, column))
+        # an island, and a district touching D22 at one corner only
+        writer.poly(_square(10, 10))
+        writer.record("ISLAND")
+        writer.poly(_square(3, 3))
+        writer.record("CORNER")
+
+
+def test_neighbour_table(tmp_path):
+    path = str(tmp_path / "districts")
+    _write_grid(path)
+    table = neighbour_table(path, "NAME", cache_dir=str(tmp_path / "cache"))
+    pairs = set(zip(table["from"], table["to"]))
+    assert len(pairs) == 2 * 12
+    assert ("D00", "D01") in pairs and ("D01", "D00") in pairs and ("D11", "D21") in pairs
+    assert ("D00", "D11") not in pairs
+    assert not {"ISLAND", "CORNER"} & set(table["from"])
+    assert len(list((tmp_path / "cache").glob("neighbours-*.csv"))) == 1
+    cached = neighbour_table(path + ".shp", "NAME", cache_dir=str(tmp_path / "cache"))
+    assert set(zip(cached["from"], cached["to"])) == pairs
+
+    corner = set(zip(*neighbour_table(path, "NAME", min_shared=1)[["from", "to"]].to_numpy().T))
+    assert ("D22", "CORNER") in corner and ("D00", "D11") in corner
+
+
+def test_candidate_pairs_match_brute_force():
+    rng = np.random.default_rng(0)
+    corner = rng.uniform(0, 100, (300, 2))
+    boxes = np.hstack([corner, corner + rng.uniform(0.5, 8, (300, 2))])
+    found = {tuple(pair) for pair in candidate_pairs(boxes)}
+    expected = {
+        (i, j) for i in range(300) for j in range(i + 1, 300)
+        if boxes[i, 0] <= boxes[j, 2] and boxes[j, 0] <= boxes[i, 2]
+        and boxes[i, 1] <= boxes[j, 3] and boxes[j, 1] <= boxes[i, 3]
+    }
+    assert found == expected
+
+
+def test_neighbours_sharing_edges_without_vertices(tmp_path):
+    path = str(tmp_path / "junction")
+    with shapefile.Writer(path, shapeType=shapefile.POLYGON) as writer:
+        writer.field("NAME", "C")
+        # BIG has no vertex where SOUTH and NORTH meet along its east edge
+        writer.poly(_square(0, 0, 2))
+        writer.record("BIG")
+        writer.poly(_square(2, 0))
+        writer.record("SOUTH")
+        writer.poly(_square(2, 1))
+        writer.record("NORTH")
+        # WEST shares the west edge of BIG with denser vertices, none of them at the corners of BIG
+        writer.poly([[(-1, 0.1), (-0.000001, 0.1), (0, 0.7), (0, 1.3), (0, 1.9), (-1, 1.9), (-1, 0.1)]])
+        writer.record("WEST")
+        # two parts, the gap between them, along the top of BIG and NORTH, is not an edge
+        writer.poly(_square(-3, 2) + _square(5, 2))
+        writer.record("SPLIT")
+    table = neighbour_table(path, "NAME", tolerance=1e-5)
+    pairs = set(zip(table["from"], table["to"]))
+    assert pairs == {
+        ("BIG", "SOUTH"), ("SOUTH", "BIG"), ("BIG", "NORTH"), ("NORTH", "BIG"), ("SOUTH", "NORTH"),
+        ("NORTH", "SOUTH"), ("BIG", "WEST"), ("WEST", "BIG"),
+    }
+
+
+def test_shared_boundary_long_edge():
+    # A has one straight 100 long south edge and 4000 vertices on its north side, B has 4000 vertices along that edge
+    n = 4000
+    x = np.linspace(100, 0, n)
+    a = np.vstack([[0, 0], [100, 0], np.column_stack([x, 1 + 0.1 * np.sin(7 * x)]), [0, 0]])
+    b = np.vstack([np.column_stack([np.linspace(0, 100, n), np.zeros(n)]), [100, -1], [0, -1], [0, 0]])
+    c = b + [0, -1.5]
+    assert list(shared_boundary([a, b, c], np.array([[0, 1], [0, 2]]))) == [True, False]
+    # the long edge is split, the search radius stays of the order of the short edges
+    assert _Edges(a).radius < 0.1
@@ -0,0 +1,55 @@
+import concurrent.futures
+
+import numpy as np
+import pandas as pd
+
+from mbench.sweep import LocalExecutor, ResultStore, parameter_grid, run_sweep
+
+_FAILURES = {}
+
+
+def _prevalence(chunk: pd.DataFrame) -> pd.DataFrame:
+    return pd.DataFrame({"point": chunk["point"], "value": chunk["eir"] * chunk["d_itn"] * chunk["coverage_ratio"]})
+
+
+def _flaky_prevalence(chunk: pd.DataFrame) -> pd.DataFrame:
+    first = int(chunk["point"].iloc[0])
+    if first % 3 == 0 and not _FAILURES.get(first):
+        _FAILURES[first] = True
+        raise RuntimeError("worker failure")
+    return _prevalence(chunk)
+
+
+def _grid():
+    gha = pd.DataFrame({"eir": [10., 20., 30.]}, index=pd.Index(["A", "B", "C"], name="adm1"))
+    return parameter_grid(gha, resistance=np.linspace(0, 1, 6), coverage_ratio=np.arange(0, 101, 20))
+
+
+def test_parameter_grid():
+    grid = _grid()
+    assert len(grid) == 3 * 6 * 6
+    assert list(grid["point"]) == list(range(len(grid)))
+    assert list(grid["adm1"].iloc[[0, 36, 72]]) == ["A", "B", "C"]
+    assert list(grid["coverage_ratio"].iloc[:6]) == [0, 20, 40, 60, 80, 100]
+    assert grid.groupby("resistance")["d_itn"].nunique().eq(1).all()
+
+
+def test_run_sweep_retry_and_resume(tmp_path):
+    grid = _grid()
+    store = ResultStore(str(tmp_path / "store"), fmt="csv")
+    report = run_sweep(grid, _flaky_prevalence, store, chunk_size=10, executor=LocalExecutor())
+    assert sorted(report["computed"]) == list(range(11)) and not report["failed"]
+    result = store.read().sort_values("point", ignore_index=True)
+    pd.testing.assert_frame_equal(result, _prevalence(grid), check_dtype=False)
+
+    resumed = run_sweep(grid, _prevalence, store, chunk_size=10, executor=LocalExecutor())
+    assert resumed["computed"] == [] and resumed["skipped"] == list(range(11))
+
+
+def test_run_sweep_process_pool(tmp_path):
+    grid = _grid()
+    store = ResultStore(str(tmp_path / "store"))
+    with concurrent.futures.ProcessPoolExecutor(2) as executor:
+        report = run_sweep(grid, _prevalence, store, chunk_size=16, executor=executor)
+    assert len(report["computed"]) == 7
+    np.testing.assert_allclose(store.read().sort_values("point")["value"], _prevalence(grid)["value"])
@@ -1,2 +1,12 @@
+from mbench._lazy import lazy_exports
+
+# np_looper is both a submodule and a function, import it eagerly so the package attribute is the function
 from .np_looper import np_looper
-from .interpolate import missing_data as missing_data_interpolate
\ No newline at end of file
+
+__getattr__, __dir__ = lazy_exports(__name__, {
+    "missing_data_interpolate": (".interpolate", "missing_data"),
+    "missing_data_interpolate_batch": (".interpolate", "missing_data_batch"),
+    "ResultCache": (".cache", "ResultCache"),
+    "stable_hash": (".cache", "stable_hash"),
+    "SourceRegistry": (".sources", "SourceRegistry"),
+})
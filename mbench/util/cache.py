@@ -0,0 +1,218 @@
+# content addressed result cache, results are keyed by a stable hash of everything they depend on, so they can be
+# shared between notebook sessions, sweeps and process pool workers
+
+import collections
+import glob
+import hashlib
+import os
+import pickle
+import tempfile
+import threading
+import types
+
+import numpy as np
+import pandas as pd
+
+# functions being hashed by this thread, recursive closures are hashed once
+_ACTIVE = threading.local()
+
+
+def _update(sha, value):
+    """
+    feed a canonical encoding of value to the hash, type tags keep e.g. 1 and "1" apart
+    """
+    if value is None or isinstance(value, (bool, int, float, complex, str, np.generic)):
+        sha.update("{}:{!r};".format(type(value).__name__, value).encode())
+    elif isinstance(value, bytes):
+        sha.update(b"bytes:" + value + b";")
+    elif isinstance(value, (list, tuple)):
+        sha.update("{}[{}]".format(type(value).__name__, len(value)).encode())
+        for item in value:
+            _update(sha, item)
+    elif isinstance(value, dict):
+        sha.update("dict[{}]".format(len(value)).encode())
+        for key in sorted(value, key=repr):
+            _update(sha, key)
+            _update(sha, value[key])
+    elif isinstance(value, np.ndarray):
+        sha.update("ndarray:{}:{};".format(value.dtype.str, value.shape).encode())
+        if value.dtype == object:
+            _update(sha, value.tolist())
+        else:
+            sha.update(np.ascontiguousarray(value).tobytes())
+    elif isinstance(value, (pd.DataFrame, pd.Series, pd.Index)):
+        sha.update("{}:{}".format(type(value).__name__, value.shape).encode())
+        if isinstance(value, pd.DataFrame):
+            _update(sha, [str(column) for column in value.columns])
+            _update(sha, [str(dtype) for dtype in value.dtypes])
+        sha.update(pd.util.hash_pandas_object(value, index=not isinstance(value, pd.Index)).to_numpy().tobytes())
+    elif isinstance(value, (set, frozenset)):
+        sha.update("{}[{}]".format(type(value).__name__, len(value)).encode())
+        for item in sorted(value, key=repr):
+            _update(sha, item)
+    elif isinstance(value, types.CodeType):
+        sha.update(b"code:" + value.co_code + b";")
+        _update(sha, (value.co_names, value.co_consts))
+    elif callable(value) and hasattr(value, "__qualname__"):
+        # functions and bound methods, e.g. converter.bioassay_to_rds_array hashes the converter parameters too
+        _update(sha, (getattr(value, "__module__", None), value.__qualname__))
+        if hasattr(value, "__self__"):
+            _update(sha, value.__self__)
+        function = getattr(value, "__func__", value)
+        active = _ACTIVE.__dict__.setdefault("functions", set())
+        if isinstance(function, types.FunctionType) and id(function) not in active:
+            # the code, so edited functions miss the cache, closures are followed into e.g. decorated functions,
+            # functions they call by name are not
+            active.add(id(function))
+            try:
+                _update(sha, (function.__code__, function.__defaults__, function.__kwdefaults__))
+                _update(sha, [cell.cell_contents for cell in function.__closure__ or ()])
+            finally:
+                active.discard(id(function))
+    elif hasattr(value, "__dict__"):
+        _update(sha, (type(value).__module__, type(value).__qualname__, vars(value)))
+    else:
+        raise TypeError("can not hash {} for the result cache".format(type(value).__name__))
+
+
+def stable_hash(*parts) -> str:
+    """
+    hash of the content of parts, stable across processes and sessions
+    :param parts: python scalars, strings, containers, numpy arrays, pandas objects, functions and plain objects
+    :return: hex digest
+    """
+    sha = hashlib.sha256()
+    _update(sha, parts)
+    return sha.hexdigest()
+
+
+class ResultCache:
+    """
+    two level cache, an in-memory LRU in front of an optional size bounded directory of pickles
+    disk entries are written to a temporary file and renamed, so concurrent process pool workers can share the same
+    directory, eviction removes the least recently used files first
+    the size of the directory is scanned on the first write and after each eviction, then kept as a running total of
+    the writes of this process, so the files of other processes count from the next scan on
+    """
+
+    def __init__(self, directory: str = None, max_items: int = 256, max_bytes: int = 1 << 30):
+        """
+        :param directory: on-disk cache directory, None for an in-memory only cache
+        :param max_items: entries kept in memory
+        :param max_bytes: size bound of the directory
+        """
+        self.directory = directory
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._memory = collections.OrderedDict()
+        self._disk_bytes = None
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], key + ".pkl")
+
+    def _entries(self):
+        """
+        (last use, size, path) of the files on disk
+        """
+        entries = []
+        for path in glob.glob(os.path.join(self.directory, "*", "*.pkl")):
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime_ns, stat.st_size, path))
+        return entries
+
+    def _remember(self, key: str, value):
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_items:
+            self._memory.popitem(last=False)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._memory or (self.directory is not None and os.path.exists(self._path(key)))
+
+    def get(self, key: str, default=None):
+        """
+        :param key: hash, see stable_hash
+        :param default: returned on a miss
+        :return: cached value
+        """
+        if key in self._memory:
+            self._memory.move_to_end(key)
+            self.hits += 1
+            return self._memory[key]
+        if self.directory is not None:
+            path = self._path(key)
+            try:
+                with open(path, "rb") as f:
+                    value = pickle.load(f)
+                os.utime(path)
+            except FileNotFoundError:
+                pass
+            else:
+                self._remember(key, value)
+                self.hits += 1
+                return value
+        self.misses += 1
+        return default
+
+    def put(self, key: str, value):
+        """
+        :param key: hash, see stable_hash
+        :param value: picklable value
+        """
+        self._remember(key, value)
+        if self.directory is None:
+            return
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        handle, temporary = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(handle, "wb") as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            size = f.tell()
+        if self._disk_bytes is None:
+            self._disk_bytes = sum(used for _, used, _ in self._entries())
+        try:
+            self._disk_bytes -= os.stat(path).st_size
+        except FileNotFoundError:
+            pass
+        os.replace(temporary, path)
+        self._disk_bytes += size
+        if self._disk_bytes > self.max_bytes:
+            self.evict()
+
+    def evict(self):
+        """
+        delete the least recently used files until the directory is below 80% of max_bytes
+        """
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= 0.8 * self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+        self._disk_bytes = total
+
+    def call(self, fn, *args, **kwargs):
+        """
+        cached fn(*args, **kwargs), keyed by the hash of fn (and its bound object) and the arguments
+        e.g. cache.call(converter.bioassay_to_rds_array, mortality)
+        """
+        key = stable_hash(fn, args, kwargs)
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = fn(*args, **kwargs)
+            self.put(key, value)
+        return value
+
+
+_MISSING = object()
@@ -0,0 +1,252 @@
+# opt-in instrumentation of the mbench hot paths, call counts, wall time, item throughput and peak traced memory
+# per function, exported as JSON or as a Chrome trace (chrome://tracing, https://ui.perfetto.dev)
+#
+# disabled by default, an instrumented function then costs one attribute lookup per call
+# enable in process with enable(), or for every process started afterwards, pool workers included, by setting
+# MBENCH_INSTRUMENT to a directory, each process then writes its metrics there and merge_directory combines them
+
+import functools
+import glob
+import json
+import multiprocessing.util
+import os
+import threading
+import time
+import tracemalloc
+
+
+class _State:
+    enabled = False
+    trace = False
+    memory = False
+    directory = None
+    flushed = 0.
+
+
+_STATE = _State()
+_LOCK = threading.Lock()
+_LOCAL = threading.local()
+# function name -> [calls, seconds, items, peak memory in bytes]
+_STATS = {}
+# complete events of the chrome trace format
+_EVENTS = []
+# seconds between two writes of the metrics of a process to the directory
+FLUSH_INTERVAL = 1.
+# python < 3.9 can not reset the peak, peaks are then measured from the start of tracing
+_reset_peak = getattr(tracemalloc, "reset_peak", lambda: None)
+
+
+def enable(trace: bool = False, memory: bool = False, directory: str = None):
+    """
+    start collecting metrics in this process
+    :param trace: also record every call as a trace event
+    :param memory: sample the peak memory of every call with tracemalloc, this slows down allocations noticeably
+    :param directory: write the metrics of this process to directory/metrics-<pid>.json as calls complete, for
+    process pools, see merge_directory
+    """
+    _STATE.trace = trace
+    _STATE.memory = memory
+    _STATE.directory = directory
+    if directory is not None:
+        os.makedirs(directory, exist_ok=True)
+        # final write when the process exits, also run by multiprocessing workers that exit normally, workers of a
+        # terminated pool lose the calls of their last FLUSH_INTERVAL
+        multiprocessing.util.Finalize(None, _flush, exitpriority=10)
+    if memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    _STATE.enabled = True
+
+
+def disable():
+    """
+    stop collecting, the metrics collected so far are kept
+    """
+    _STATE.enabled = False
+    if _STATE.directory is not None:
+        _flush()
+    if _STATE.memory and tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+
+def reset():
+    """
+    drop the metrics collected so far
+    """
+    with _LOCK:
+        _STATS.clear()
+        del _EVENTS[:]
+
+
+def _items(value):
+    """
+    rows of pandas objects, elements of numpy arrays, length of other sized objects
+    """
+    if hasattr(value, "iloc"):
+        return len(value)
+    size = getattr(value, "size", None)
+    if isinstance(size, int):
+        return size
+    try:
+        return len(value)
+    except TypeError:
+        return None
+
+
+def _flush():
+    if _STATE.directory is None:
+        return
+    with _LOCK:
+        snapshot_ = snapshot()
+    path = os.path.join(_STATE.directory, "metrics-{}.json".format(os.getpid()))
+    with open(path + ".tmp", "w") as f:
+        json.dump(snapshot_, f)
+    os.replace(path + ".tmp", path)
+    _STATE.flushed = time.perf_counter()
+
+
+def _record(name, start, seconds, items, peak):
+    with _LOCK:
+        stats = _STATS.get(name)
+        if stats is None:
+            stats = _STATS[name] = [0, 0., 0, 0]
+        stats[0] += 1
+        stats[1] += seconds
+        stats[2] += items or 0
+        stats[3] = max(stats[3], peak)
+        if _STATE.trace:
+            _EVENTS.append({
+                "name": name, "ph": "X", "ts": start * 1e6, "dur": seconds * 1e6,
+                "pid": os.getpid(), "tid": threading.get_ident(),
+                "args": {} if items is None else {"items": items},
+            })
+
+
+def instrument(fn=None, name: str = None, items: int = 0):
+    """
+    decorator collecting the metrics of fn while instrumentation is enabled
+    :param fn: function or method
+    :param name: name in the metrics, default to module.qualname
+    :param items: position of the argument whose size is the throughput unit (rows of a DataFrame, elements of an
+    array), 1 for methods, None to count calls only
+    """
+    if fn is None:
+        return functools.partial(instrument, name=name, items=items)
+    name = name or "{}.{}".format(fn.__module__, fn.__qualname__)
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        if not _STATE.enabled:
+            return fn(*args, **kwargs)
+        count = _items(args[items]) if items is not None and len(args) > items else None
+        stack = getattr(_LOCAL, "stack", None)
+        if stack is None:
+            stack = _LOCAL.stack = []
+        if _STATE.memory:
+            # peak since the call started, the nested calls reset the peak so their own peaks are carried up
+            base = tracemalloc.get_traced_memory()[0]
+            _reset_peak()
+            stack.append([base, 0])
+        else:
+            stack.append(None)
+        start = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            seconds = time.perf_counter() - start
+            frame = stack.pop()
+            peak = 0
+            if frame is not None:
+                peak = max(tracemalloc.get_traced_memory()[1], frame[1])
+                if stack and stack[-1] is not None:
+                    stack[-1][1] = max(stack[-1][1], peak)
+                peak -= frame[0]
+            _record(name, start, seconds, count, peak)
+            if _STATE.directory is not None and not stack and \
+                    time.perf_counter() - _STATE.flushed > FLUSH_INTERVAL:
+                _flush()
+
+    return wrapper
+
+
+def snapshot() -> dict:
+    """
+    metrics collected in this process, picklable and JSON serializable
+    :return: dict with functions (name -> calls, seconds, items, peak_bytes) and trace events
+    """
+    return {
+        "functions": {
+            name: {"calls": calls, "seconds": seconds, "items": items, "peak_bytes": peak}
+            for name, (calls, seconds, items, peak) in _STATS.items()
+        },
+        "events": list(_EVENTS),
+    }
+
+
+def merge(snapshots) -> dict:
+    """
+    combine the snapshots of several processes, counts and times add up, peaks take the maximum
+    :param snapshots: iterable of snapshot dicts
+    :return: snapshot dict
+    """
+    functions, events = {}, []
+    for other in snapshots:
+        for name, stats in other["functions"].items():
+            total = functions.setdefault(name, {"calls": 0, "seconds": 0., "items": 0, "peak_bytes": 0})
+            for key in ("calls", "seconds", "items"):
+                total[key] += stats[key]
+            total["peak_bytes"] = max(total["peak_bytes"], stats["peak_bytes"])
+        events.extend(other["events"])
+    return {"functions": functions, "events": events}
+
+
+def merge_directory(directory: str) -> dict:
+    """
+    merge the metrics written by every process to directory, see enable
+    """
+    snapshots = []
+    for path in sorted(glob.glob(os.path.join(directory, "metrics-*.json"))):
+        with open(path) as f:
+            snapshots.append(json.load(f))
+    return merge(snapshots)
+
+
+def summary(snapshot_: dict = None) -> list:
+    """
+    one row per function, slowest first, with mean seconds per call and items per second
+    """
+    snapshot_ = snapshot() if snapshot_ is None else snapshot_
+    rows = []
+    for name, stats in snapshot_["functions"].items():
+        rows.append(dict(
+            stats, name=name,
+            per_call=stats["seconds"] / stats["calls"],
+            throughput=stats["items"] / stats["seconds"] if stats["items"] and stats["seconds"] else None,
+        ))
+    return sorted(rows, key=lambda row: -row["seconds"])
+
+
+def export(path: str, snapshot_: dict = None, fmt: str = None) -> str:
+    """
+    write metrics to a file
+    :param path: output path
+    :param snapshot_: metrics, default to this process
+    :param fmt: "json" for the functions and events, "chrome" for the trace event format, default to chrome
+    for paths ending in .trace.json
+    :return: path
+    """
+    snapshot_ = snapshot() if snapshot_ is None else snapshot_
+    if fmt is None:
+        fmt = "chrome" if path.endswith(".trace.json") else "json"
+    if fmt == "chrome":
+        content = {"traceEvents": snapshot_["events"], "displayTimeUnit": "ms"}
+    elif fmt == "json":
+        content = dict(snapshot_, summary=summary(snapshot_))
+    else:
+        raise ValueError("unknown format {}".format(fmt))
+    with open(path, "w") as f:
+        json.dump(content, f)
+    return path
+
+
+if os.environ.get("MBENCH_INSTRUMENT"):
+    enable(trace=os.environ.get("MBENCH_INSTRUMENT_TRACE") == "1", directory=os.environ["MBENCH_INSTRUMENT"])
@@ -1,61 +1,195 @@
-import math
-
+import numpy as np
 import pandas as pd
+from scipy import sparse
+from scipy.sparse import csgraph
+from scipy.sparse.linalg import spsolve
+
+from .instrument import instrument
+
+
+def adjacency_matrix(
+    index: pd.Index,
+    neighbour: pd.DataFrame,
+    from_column: str = "from",
+    to_column: str = "to",
+):
+    """
+    Build a sparse adjacency matrix from a from/to neighbour list, rows and columns follow `index`.
+    Pairs referring to names not in `index` are dropped, repeated pairs add up.
+    :param index: index of the dataframe to be interpolated, e.g. adm1 provinces
+    :param neighbour: neighbour list, one row per (from, to) pair
+    :param from_column:
+    :param to_column:
+    :return: scipy.sparse.csr_matrix of shape (len(index), len(index))
+    """
+    rows = index.get_indexer(neighbour[from_column])
+    cols = index.get_indexer(neighbour[to_column])
+    known = (rows >= 0) & (cols >= 0)
+    return sparse.csr_matrix(
+        (np.ones(known.sum()), (rows[known], cols[known])),
+        shape=(len(index), len(index)),
+    )
 
 
+def smooth(adjacency, values: np.ndarray, missing: np.ndarray, round_n: int, tol: float = None):
+    """
+    Replace missing values by the mean of their neighbours, up to `round_n` times.
+    Every round is one masked sparse mat-vec over all columns: neighbours which are still nan are left out of the
+    mean, and a value with no known neighbour stays nan.
+    :param adjacency: sparse adjacency matrix, see adjacency_matrix
+    :param values: 2d array (regions x columns)
+    :param missing: boolean array of the same shape, the values to be interpolated
+    :param round_n: maximum round of averaging
+    :param tol: a column stops once the largest change of a round is below tol, None to always run round_n rounds
+    :return: interpolated copy of values, rounds used and residual (largest change of the last round) per column
+    """
+    values = np.array(values, dtype=float)
+    rounds = np.zeros(values.shape[1], dtype=int)
+    residual = np.zeros(values.shape[1])
+    active = np.flatnonzero(missing.any(axis=0))
+    for _ in range(round_n):
+        if len(active) == 0:
+            break
+        current = values[:, active]
+        known = ~np.isnan(current)
+        total = adjacency @ np.where(known, current, 0.)
+        count = adjacency @ known.astype(float)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = np.where(count > 0, total / count, np.nan)
+        update = missing[:, active]
+        updated = np.where(update, mean, current)
+
+        # a value filled for the first time is an infinite change
+        change = np.abs(updated - current)
+        change[np.isnan(current) & ~np.isnan(updated)] = np.inf
+        change = np.nanmax(np.where(update, change, 0.), axis=0, initial=0.)
+
+        values[:, active] = updated
+        rounds[active] += 1
+        residual[active] = change
+        if tol is not None:
+            active = active[change >= tol]
+    return values, rounds, residual
+
+
+def harmonic(adjacency, values: np.ndarray, missing: np.ndarray):
+    """
+    Solve directly for the fixed point of `smooth`: every missing value is the mean of its neighbours.
+    This is a sparse linear system on the missing regions, groups of missing regions without any known neighbour
+    have no solution and stay nan.
+    :param adjacency: sparse adjacency matrix, see adjacency_matrix
+    :param values: 2d array (regions x columns)
+    :param missing: boolean array of the same shape, the values to be interpolated
+    :return: interpolated copy of values
+    """
+    values = np.array(values, dtype=float)
+    adjacency = sparse.csr_matrix(adjacency)
+    for j in range(values.shape[1]):
+        unknown = np.flatnonzero(missing[:, j])
+        if len(unknown) == 0:
+            continue
+        known = np.flatnonzero(~missing[:, j] & ~np.isnan(values[:, j]))
+        values[unknown, j] = np.nan
+
+        # missing regions connected to each other, keep only groups touching a known region
+        inner = adjacency[unknown][:, unknown]
+        _, group = csgraph.connected_components(inner, directed=False)
+        boundary = np.asarray(adjacency[unknown][:, known].sum(axis=1)).ravel() > 0
+        solvable = np.isin(group, group[boundary])
+        unknown, inner = unknown[solvable], inner[solvable][:, solvable]
+        if len(unknown) == 0:
+            continue
+
+        # degree * v - (sum of missing neighbours) = sum of known neighbours
+        outer = adjacency[unknown][:, known]
+        degree = np.asarray(inner.sum(axis=1)).ravel() + np.asarray(outer.sum(axis=1)).ravel()
+        laplacian = sparse.diags(degree) - inner
+        rhs = outer @ values[known, j]
+        values[unknown, j] = np.atleast_1d(spsolve(sparse.csc_matrix(laplacian), rhs))
+    return values
+
+
+@instrument
 def missing_data(
-    df: pd.DataFrame, 
-    neighbour: pd.DataFrame, 
-    column: str, 
-    round_n: int
+    df: pd.DataFrame,
+    neighbour: pd.DataFrame,
+    column,
+    round_n: int,
+    method: str = "iterate",
 ):
     """
     Missing_data_interpolate(), when data was missing in some provinces, use this function to interpolate the missing data.
-    :param neighbour:
+    :param neighbour: neighbour list with "from" and "to" columns
     :param df: pandas dataframe to be processed, the dataframe should firstly be process with reformat function, and the index of df should be adm1 provinces
-    :param column: the target column
+    :param column: the target column, or a list of columns
     :param round_n: round of averaging, the larger number the smoother, but requires more computing power, default is 3
+    :param method: "iterate" averages neighbours round_n times, "harmonic" solves for the limit of infinitely many rounds
     :return: df: calculated dataframe with filled data
     """
+    columns = list(column) if pd.api.types.is_list_like(column) else [column]
+    values = df[columns].to_numpy(dtype=float)
+    missing = np.isnan(values)
+    adjacency = adjacency_matrix(df.index, neighbour)
+    if method == "iterate":
+        values = smooth(adjacency, values, missing, round_n)[0]
+    elif method == "harmonic":
+        values = harmonic(adjacency, values, missing)
+    else:
+        raise ValueError("method should be iterate or harmonic, got {}".format(method))
 
-    global result_df
-    def get_adjacent(
-            adm1: str,
-            adjacent_list: pd.DataFrame,
-            from_column: str = "from",
-            to_column: str = "to",
-    ):
-        return adjacent_list[adjacent_list[from_column] == adm1][to_column]
-
-    def interpolate(
-            _df: pd.DataFrame,
-            targeted_adm1: str,
-            targeted_column: str,
-            adjacent_adm1: pd.Series,
-    ):
-        adjacent_adm1_row = _df.loc[adjacent_adm1.tolist(), :]
-        interpolated = adjacent_adm1_row[targeted_column].mean()
-        result_row = _df.loc[targeted_adm1, :]
-        result_row[targeted_column] = interpolated
-        return result_row
-
-    # 1. notation 标记
-    df["__missing"] = df[column].map(lambda x: math.isnan(x))
-    # 2. get missing adm1 regions
-    for _ in range(round_n):
-        df = df.apply(
-            lambda row: interpolate(
-                _df=df,
-                targeted_adm1=row.name,
-                targeted_column=column,
-                adjacent_adm1=get_adjacent(adm1=row.name, adjacent_list=neighbour),
-            )
-            if row["__missing"]
-            else row,
-            axis=1,
-        )
-
-        
-    result_df = df
-    result_df = result_df.drop(columns=["__missing"])
+    result_df = df.copy()
+    result_df[columns] = values
     return result_df
+
+
+@instrument
+def missing_data_batch(
+    frames,
+    neighbour: pd.DataFrame,
+    columns,
+    round_n: int = 100,
+    tol: float = 1e-8,
+):
+    """
+    Interpolate many columns of many scenario replicates in one pass, with per column convergence stopping.
+    All frames must share the same index, their columns are stacked into a single 2d array, and each column stops
+    averaging once the largest change of a round is below `tol`. The inputs are not modified.
+    :param frames: pandas dataframe, or a list or dict of dataframes (scenarios) with the same index
+    :param neighbour: neighbour list with "from" and "to" columns
+    :param columns: columns to interpolate, e.g. ["eir", "treatment_seeking", "itn_cov"]
+    :param round_n: maximum round of averaging
+    :param tol: convergence tolerance, None to always run round_n rounds
+    :return: interpolated frame(s) of the same kind as `frames`, and a report dataframe with the missing count,
+    the rounds used and the residual of each (scenario, column)
+    """
+    columns = list(columns) if pd.api.types.is_list_like(columns) else [columns]
+    if isinstance(frames, pd.DataFrame):
+        scenarios = {None: frames}
+    elif isinstance(frames, dict):
+        scenarios = dict(frames)
+    else:
+        scenarios = dict(enumerate(frames))
+    index = next(iter(scenarios.values())).index
+    for frame in scenarios.values():
+        if not frame.index.equals(index):
+            raise ValueError("all scenarios should share the same index")
+
+    values = np.hstack([frame[columns].to_numpy(dtype=float) for frame in scenarios.values()])
+    missing = np.isnan(values)
+    values, rounds, residual = smooth(adjacency_matrix(index, neighbour), values, missing, round_n, tol)
+
+    results = {}
+    for i, (key, frame) in enumerate(scenarios.items()):
+        result = frame.copy()
+        result[columns] = values[:, i * len(columns):(i + 1) * len(columns)]
+        results[key] = result
+    report = pd.DataFrame(
+        {"missing": missing.sum(axis=0), "rounds": rounds, "residual": residual},
+        index=pd.MultiIndex.from_product([list(scenarios), columns], names=["scenario", "column"]),
+    )
+
+    if isinstance(frames, pd.DataFrame):
+        return results[None], report.droplevel("scenario")
+    if isinstance(frames, dict):
+        return results, report
+    return list(results.values()), report
@@ -1,3 +1,76 @@
-def np_looper(fn, np_x):
-    lambda_fn = lambda _: fn(_)
-    return lambda_fn(np_x)
+import multiprocessing
+
+import numpy as np
+
+# function applied by the pool workers, set once per worker by _init_worker
+_WORKER_FN = None
+
+
+def numpy_native(fn):
+    """
+    mark fn as taking numpy arrays elementwise, np_looper then calls it once on the whole array
+    works on functions, methods and staticmethods (apply it below @staticmethod)
+    """
+    fn.__numpy_native__ = True
+    return fn
+
+
+def is_numpy_native(fn) -> bool:
+    """
+    numpy ufuncs and functions marked with numpy_native, bound methods forward attribute lookups to the function so
+    marked methods are recognised on any instance
+    """
+    return isinstance(fn, np.ufunc) or getattr(fn, "__numpy_native__", False)
+
+
+def _init_worker(fn):
+    global _WORKER_FN  # pylint: disable=global-statement
+    _WORKER_FN = fn
+
+
+def _apply_chunk(chunk):
+    return np.frompyfunc(_WORKER_FN, 1, 1)(chunk)
+
+
+def np_looper(fn, np_x, dtype=None, out=None, chunk_size: int = 1 << 16, processes: int = None):
+    """
+    apply a function of one value elementwise over an array
+    numpy native functions (see numpy_native, and numpy ufuncs) get the whole array, scalar functions are applied
+    chunk by chunk with np.frompyfunc, or across a process pool for expensive ones
+    :param fn: function of one value, must be picklable when processes is set
+    :param np_x: scalar, list, numpy array or pandas Series
+    :param dtype: output dtype, default to float64, object for functions returning tuples or strings
+    :param out: preallocated output array of the shape of np_x, filled in place and returned
+    :param chunk_size: elements converted per frompyfunc call, bounds the temporary object arrays
+    :param processes: worker processes for scalar functions, None to stay in process
+    :return: array of the shape of np_x, a Series with the same index for Series input, a scalar for scalar input
+    """
+    index = getattr(np_x, "index", None)
+    x = np.asarray(np_x)
+    if out is None:
+        out = np.empty(x.shape, dtype=np.float64 if dtype is None else dtype)
+    elif out.shape != x.shape:
+        raise ValueError("out has shape {}, expected {}".format(out.shape, x.shape))
+
+    if is_numpy_native(fn):
+        out[...] = fn(x)
+    else:
+        flat_x = x.reshape(-1)
+        flat_out = out.reshape(-1)
+        starts = range(0, flat_x.size, chunk_size)
+        if processes is None:
+            apply = np.frompyfunc(fn, 1, 1)
+            for start in starts:
+                flat_out[start:start + chunk_size] = apply(flat_x[start:start + chunk_size])
+        else:
+            chunks = (flat_x[start:start + chunk_size] for start in starts)
+            with multiprocessing.Pool(processes, initializer=_init_worker, initargs=(fn,)) as pool:
+                for start, values in zip(starts, pool.imap(_apply_chunk, chunks)):
+                    flat_out[start:start + chunk_size] = values
+        if not np.shares_memory(flat_out, out):
+            out[...] = flat_out.reshape(x.shape)
+
+    if index is not None and out.ndim == 1:
+        import pandas as pd  # pylint: disable=import-outside-toplevel
+        return pd.Series(out, index=index, name=getattr(np_x, "name", None))
+    return out[()] if out.ndim == 0 else out
@@ -0,0 +1,199 @@
+# registry of the input tables of a data preparation notebook, each source is read once with its (slow, e.g. Excel)
+# reader and converted to a columnar cache file that is reused until the source file changes
+
+import concurrent.futures
+import glob
+import os
+import re
+import tempfile
+
+import pandas as pd
+
+from .cache import stable_hash
+from .instrument import instrument
+
+try:
+    import pyarrow  # noqa: F401 pylint: disable=unused-import
+except ImportError:
+    _DEFAULT_FORMAT = "pickle"
+else:
+    _DEFAULT_FORMAT = "parquet"
+
+_READERS = {
+    ".xlsx": pd.read_excel,
+    ".xls": pd.read_excel,
+    ".csv": pd.read_csv,
+    ".txt": pd.read_csv,
+    ".dta": pd.read_stata,
+}
+
+
+def _write(df: pd.DataFrame, stem: str, fmt: str) -> str:
+    """
+    write df atomically, fall back to pickle for frames the columnar formats can not hold (e.g. mixed type columns
+    from spreadsheets, or a non default index for feather)
+    :return: path written
+    """
+    handle, temporary = tempfile.mkstemp(dir=os.path.dirname(stem), suffix=".tmp")
+    os.close(handle)
+    try:
+        try:
+            if fmt == "parquet":
+                df.to_parquet(temporary)
+            elif fmt == "feather":
+                df.to_feather(temporary)
+            else:
+                fmt = "pickle"
+                df.to_pickle(temporary)
+        except (ValueError, TypeError, NotImplementedError, ImportError):
+            fmt = "pickle"
+            df.to_pickle(temporary)
+        path = "{}.{}".format(stem, fmt)
+        os.replace(temporary, path)
+    except BaseException:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+        raise
+    return path
+
+
+def _read(path: str) -> pd.DataFrame:
+    extension = os.path.splitext(path)[1]
+    if extension == ".parquet":
+        return pd.read_parquet(path)
+    if extension == ".feather":
+        return pd.read_feather(path)
+    return pd.read_pickle(path)
+
+
+class SourceRegistry:
+    """
+    named input tables with a typed on-disk cache
+    e.g.
+        sources = SourceRegistry(data_dir, cache_dir=data_dir + ".cache")
+        sources.register("phc", "GHA/Demographic/2021_PHC/2021 PHC summary.xlsx")
+        sources.register("who_ir", "GHA/WHO_IR_data/bioassay.xlsx", sheet_name="Data")
+        tables = sources.load_all()
+    """
+
+    def __init__(self, data_dir: str = "", cache_dir: str = None, fmt: str = None, max_workers: int = None):
+        """
+        :param data_dir: directory relative source paths are resolved against
+        :param cache_dir: directory of the converted tables, None to always read the sources
+        :param fmt: "parquet", "feather" or "pickle", default to parquet when pyarrow is installed
+        :param max_workers: threads used by load_all
+        """
+        self.data_dir = data_dir
+        self.cache_dir = cache_dir
+        self.format = fmt or _DEFAULT_FORMAT
+        self.max_workers = max_workers
+        self.sources = {}
+        if cache_dir is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def register(self, name: str, path: str, reader=None, **kwargs):
+        """
+        :param name: key of the source
+        :param path: file path, relative to data_dir
+        :param reader: function of (path, **kwargs) returning a DataFrame, default chosen by the file extension
+        :param kwargs: passed to the reader, part of the cache key
+        :return: self, so registrations can be chained
+        """
+        if reader is None:
+            extension = os.path.splitext(path)[1].lower()
+            if extension not in _READERS:
+                raise ValueError("no default reader for {}, pass reader=".format(path))
+            reader = _READERS[extension]
+        self.sources[name] = (os.path.join(self.data_dir, path), reader, kwargs)
+        return self
+
+    def _cached(self, name: str) -> list:
+        """
+        converted tables of one source on disk, any version, not those of sources whose name starts with name
+        """
+        pattern = re.compile(r"{}-[0-9a-f]{{16}}\.(parquet|feather|pickle)".format(re.escape(name)))
+        return [
+            os.path.join(self.cache_dir, file_name) for file_name in os.listdir(self.cache_dir)
+            if pattern.fullmatch(file_name)
+        ]
+
+    def _key(self, name: str) -> str:
+        path, reader, kwargs = self.sources[name]
+        stat = os.stat(path)
+        return stable_hash(os.path.abspath(path), stat.st_mtime_ns, stat.st_size, reader, kwargs, self.format)[:16]
+
+    @instrument(items=None)
+    def load(self, name: str, cache: bool = True) -> pd.DataFrame:
+        """
+        :param name: registered source
+        :param cache: read the converted table if the source file is unchanged since it was written
+        :return: DataFrame
+        """
+        path, reader, kwargs = self.sources[name]
+        if self.cache_dir is None or not cache:
+            return reader(path, **kwargs)
+        key = self._key(name)
+        stem = os.path.join(self.cache_dir, "{}-{}".format(name, key))
+        for cached in glob.glob(glob.escape(stem) + ".*"):
+            if not cached.endswith(".tmp"):
+                return _read(cached)
+        df = reader(path, **kwargs)
+        written = _write(df, stem, self.format)
+        for stale in self._cached(name):
+            if stale != written:
+                os.remove(stale)
+        return df
+
+    def load_all(self, names=None, cache: bool = True) -> dict:
+        """
+        load sources concurrently, cached tables are decoded outside the GIL so they load in parallel
+        :param names: sources to load, default to all registered
+        :param cache: see load
+        :return: dict of name to DataFrame
+        """
+        names = list(self.sources) if names is None else list(names)
+        with concurrent.futures.ThreadPoolExecutor(self.max_workers) as executor:
+            futures = {name: executor.submit(self.load, name, cache) for name in names}
+            return {name: future.result() for name, future in futures.items()}
+
+    def clear(self, name: str = None):
+        """
+        delete the cached tables of one source, or of all sources
+        """
+        for name_ in self.sources if name is None else [name]:
+            for cached in self._cached(name_):
+                os.remove(cached)
+
+
+def gha_sources(data_dir: str, cache_dir: str = None, **kwargs) -> SourceRegistry:
+    """
+    the Excel and csv inputs of GHA_data_preparation.ipynb
+    :param data_dir: benchmarking data directory
+    :param cache_dir: default to a .cache directory inside data_dir
+    :param kwargs: passed to SourceRegistry
+    :return: SourceRegistry
+    """
+    if cache_dir is None:
+        cache_dir = os.path.join(data_dir, ".cache")
+    sources = SourceRegistry(data_dir, cache_dir, **kwargs)
+    sources.register("phc", "GHA/Demographic/2021_PHC/2021 PHC summary.xlsx")
+    sources.register("demographic", "GHA/demographic/ghana.xlsx", sheet_name="Sheet2")
+    sources.register("adjacent", "gha_adm_adjacent.xlsx", sheet_name="adm1_adjacent")
+    sources.register("district_216_260", "GHA/ADM1/216 to 260.csv")
+    sources.register("incid", "GHA/Routine_data/District-level/incid.csv")
+    sources.register(
+        "district_summaries",
+        "GHA/MAP_District_Estimates/Maps_by_MAP_260districts/GHA_summaries/GHA_new_district_summaries.xlsx",
+        sheet_name="district_summaries",
+    )
+    sources.register("intervention", "GHA/Interventions/GHA_Intervention_data.xlsx", sheet_name="Data template ")
+    sources.register(
+        "who_ir", "GHA/WHO_IR_data/MTM_DISCRIMINATING_CONCENTRATION_BIOASSAY_20211130.xlsx", sheet_name="Data"
+    )
+    sources.register(
+        "treatment_seeking",
+        "GHA/MIS-DHS_data/GHA_treatment_seeking_tprs_adm1_16regions.xlsx",
+        sheet_name="Sheet",
+    )
+    sources.register("eir", "eir.csv")
+    return sources
@@ -1,12 +1,106 @@
+import copy
+import hashlib
+import os
+
 from lxml import etree
 
+from .instrument import instrument
+
+# parsed files, keyed by (absolute path, what was parsed), see _cached
+_CACHE = {}
+
+
+def _digest(path: str) -> str:
+    sha1 = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            sha1.update(block)
+    return sha1.hexdigest()
+
+
+def _cached(path: str, kind, parse):
+    """
+    parse a file once per process, the entry is reused while the mtime and size are unchanged, or when they changed
+    but the content hash did not (e.g. the file was touched or copied over with the same content)
+    :param path: file path
+    :param kind: hashable describing what is parsed from the file
+    :param parse: function of path
+    :return: cached result of parse(path)
+    """
+    key = (os.path.abspath(path), kind)
+    stat = os.stat(path)
+    entry = _CACHE.get(key)
+    if entry is not None and entry[:2] == (stat.st_mtime_ns, stat.st_size):
+        return entry[3]
+    digest = _digest(path)
+    value = entry[3] if entry is not None and entry[2] == digest else parse(path)
+    _CACHE[key] = (stat.st_mtime_ns, stat.st_size, digest, value)
+    return value
+
+
+def clear_cache():
+    """
+    drop every parsed file from the in-process cache
+    """
+    _CACHE.clear()
+
 
-def load_xml_config(path: str):
+@instrument(items=None)
+def load_xml_config(path: str, cache: bool = True):
     """
     parse XML file into an lxml object
     :param path: string
+    :param cache: reuse the tree parsed earlier from the same unchanged file, the caller gets a copy it can modify
     :return: parsed etree object
     """
-    # xml file is quite small, load it into string once
-    root = etree.parse(path)
-    return root
+    if not cache:
+        return etree.parse(path)
+    return copy.deepcopy(_cached(path, "tree", etree.parse))
+
+
+def _iter_sections(path: str, sections):
+    """
+    stream the top level elements of an XML file, keep the requested ones and free the others as soon as they end
+    """
+    found = {}
+    depth = 0
+    with open(path, "rb") as f:
+        for event, element in etree.iterparse(f, events=("start", "end")):
+            if event == "start":
+                depth += 1
+                continue
+            depth -= 1
+            if depth != 1:
+                continue
+            name = etree.QName(element).localname
+            if name in sections:
+                found[name] = element
+            else:
+                element.clear()
+            # detach finished siblings, kept sections stay alive through found
+            parent = element.getparent()
+            while element.getprevious() is not None:
+                del parent[0]
+            if len(found) == len(sections):
+                break
+    return found
+
+
+@instrument(items=None)
+def load_xml_sections(
+        path: str,
+        sections=("demography", "entomology", "interventions"),
+        cache: bool = True,
+):
+    """
+    stream an OpenMalaria scenario and keep only some of its top level sections, without building the whole tree
+    :param path: string
+    :param sections: local names of the top level elements to keep
+    :param cache: reuse the sections parsed earlier from the same unchanged file, the caller gets copies
+    :return: dict of section name to element, sections absent from the file are left out
+    """
+    sections = tuple(sections)
+    if not cache:
+        return _iter_sections(path, sections)
+    found = _cached(path, ("sections", sections), lambda _path: _iter_sections(_path, sections))
+    return {name: copy.deepcopy(element) for name, element in found.items()}